@@ -0,0 +1,105 @@
+import sys
+import time
+import asyncio
+import argparse
+
+import httpx
+import numpy as np
+
+CHARTS = ['salary-distribution', 'jobs-trend', 'salary-location-analysis',
+          'correlation-heatmap', 'treemap-sunburst', 'skills-analysis']
+
+def percentiles(latencies):
+    values = np.array(latencies) * 1000
+    if not len(values):
+        return {'count': 0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    return {
+        'count': len(values),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max())
+    }
+
+async def poll_health(client, stop, interval, latencies):
+    """Gọi /health liên tục, ghi lại latency của từng request"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get('/health')
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+async def chart_worker(client, stop, charts, collection, cold, latencies, errors):
+    """Request lần lượt các chart; cold=True xóa cache trước mỗi vòng để buộc build lại"""
+    params = {'collection': collection} if collection else {}
+    while not stop.is_set():
+        if cold:
+            await client.post('/api/cache/invalidate')
+        for name in charts:
+            if stop.is_set():
+                break
+            start = time.perf_counter()
+            response = await client.get(f'/api/charts/{name}', params=params)
+            if response.status_code != 200:
+                errors.append((name, response.status_code))
+            latencies.append(time.perf_counter() - start)
+
+async def run_phase(url, duration, interval, charts=None, concurrency=0, collection=None, cold=True):
+    health, chart_latencies, errors = [], [], []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        tasks = [asyncio.create_task(poll_health(client, stop, interval, health))]
+        for _ in range(concurrency):
+            tasks.append(asyncio.create_task(
+                chart_worker(client, stop, charts, collection, cold, chart_latencies, errors)))
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return percentiles(health), percentiles(chart_latencies), errors
+
+def print_stats(label, stats):
+    print(f"  {label:<22} n={stats['count']:<6} p50={stats['p50']:8.1f}ms p95={stats['p95']:8.1f}ms "
+          f"p99={stats['p99']:8.1f}ms max={stats['max']:8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test: latency /health khi API đang build chart")
+    parser.add_argument('--url', default='http://localhost:8000', help="Địa chỉ API (app_clean)")
+    parser.add_argument('--duration', type=float, default=10, help="Thời gian mỗi pha (giây)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Số client request chart đồng thời")
+    parser.add_argument('--interval', type=float, default=0.02, help="Khoảng nghỉ giữa các lần gọi /health (giây)")
+    parser.add_argument('--charts', default=','.join(CHARTS), help="Danh sách chart, cách nhau bởi dấu phẩy")
+    parser.add_argument('--collection', default=None, help="Collection cần phân tích (mặc định tất cả)")
+    parser.add_argument('--warm', action='store_true', help="Không xóa cache giữa các vòng (đo trạng thái ổn định)")
+    parser.add_argument('--max-p99-ratio', type=float, default=3.0,
+                        help="Fail nếu p99 /health khi có tải lớn hơn baseline quá số lần này")
+    parser.add_argument('--min-p99-ms', type=float, default=20.0,
+                        help="Bỏ qua so sánh tỉ lệ khi p99 khi có tải vẫn dưới ngưỡng này (ms)")
+    args = parser.parse_args()
+    charts = [name.strip() for name in args.charts.split(',') if name.strip()]
+
+    print(f"🎯 {args.url} | {args.concurrency} client chart, {args.duration:.0f}s mỗi pha, "
+          f"{'warm' if args.warm else 'cold'} cache")
+
+    print("1) Baseline: chỉ /health")
+    baseline, _, _ = asyncio.run(run_phase(args.url, args.duration, args.interval))
+    print_stats('/health', baseline)
+
+    print("2) /health trong khi build chart")
+    loaded, chart_stats, errors = asyncio.run(run_phase(
+        args.url, args.duration, args.interval, charts, args.concurrency, args.collection, not args.warm))
+    print_stats('/health', loaded)
+    print_stats('/api/charts/*', chart_stats)
+    if errors:
+        print(f"⚠️  {len(errors)} chart request lỗi, vd: {errors[:3]}")
+
+    ratio = loaded['p99'] / baseline['p99'] if baseline['p99'] else float('inf')
+    print(f"p99 /health: {baseline['p99']:.1f}ms -> {loaded['p99']:.1f}ms ({ratio:.1f}x)")
+    if loaded['p99'] > args.min_p99_ms and ratio > args.max_p99_ratio:
+        print(f"❌ p99 /health tăng quá {args.max_p99_ratio:.1f}x khi có tải chart")
+        return 1
+    print("✅ /health vẫn phản hồi ổn định khi có tải chart")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import requests
+import pandas as pd
+from parsers import PARSER_BACKENDS
+from crawl import crawl_one_page, parse_salary, parse_update_time
+from parsing import parse_salary_series, parse_update_series, memo_clear, memo_stats
+from crawl_async import crawl_all
+from ratelimit import RateLimiter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+def load_corpus():
+    """Đọc các trang listing trong fixtures (bỏ qua trang không có job)"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'topcv_listing_page_*.html'))):
+        with open(path, 'rb') as f:
+            corpus.append(f.read())
+    return corpus
+
+def start_fixture_server(corpus, latency=0.0):
+    """HTTP server local thay cho topcv.vn: trả trang fixture theo tham số page"""
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            page = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+            body = corpus[(page - 1) % len(corpus)]
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def bench_parse(corpus, repeat):
+    """Parse từ đĩa: pages/sec và jobs/sec cho từng backend"""
+    results = {}
+    for name, parse in PARSER_BACKENDS.items():
+        jobs = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for content in corpus:
+                jobs += len(parse(content) or [])
+        elapsed = time.perf_counter() - start
+        pages = repeat * len(corpus)
+        results[f'parse_{name}_pages_per_sec'] = pages / elapsed
+        results[f'parse_{name}_jobs_per_sec'] = jobs / elapsed
+    return results
+
+def bench_fields(corpus, repeat):
+    """Thời gian parse từng trường (µs/lần gọi) trên giá trị thô lấy từ corpus; memo được xóa
+    trước mỗi lượt để đo parse thật chứ không đo cache hit của lượt trước"""
+    parse = PARSER_BACKENDS['bs4']
+    items = [item for content in corpus for item in parse(content)]
+    fields = {
+        'salary_text': parse_salary,
+        'update_raw': parse_update_time,
+    }
+    results = {}
+    for field, func in fields.items():
+        values = [item[field] for item in items]
+        elapsed = 0.0
+        for _ in range(repeat):
+            memo_clear()
+            start = time.perf_counter()
+            for value in values:
+                func(value)
+            elapsed += time.perf_counter() - start
+        results[f'field_{field}_us_per_call'] = elapsed / (repeat * len(values)) * 1e6
+
+    # Bản batch: parse cả cột một lần (giá trị unique rồi map ngược lại)
+    frame = pd.DataFrame(items)
+    memo_clear()
+    series_fields = {
+        'salary_text': parse_salary_series,
+        'update_raw': parse_update_series,
+    }
+    for field, func in series_fields.items():
+        column = pd.concat([frame[field]] * repeat, ignore_index=True)
+        start = time.perf_counter()
+        func(column)
+        elapsed = time.perf_counter() - start
+        results[f'field_{field}_series_us_per_row'] = elapsed / len(column) * 1e6
+    return results
+
+def bench_http(corpus, pages, latency, concurrency):
+    """Fetch + parse qua HTTP local: crawl tuần tự (requests) và crawl async"""
+    server = start_fixture_server(corpus, latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/tim-viec-lam"
+    results = {}
+    try:
+        session = requests.Session()
+        # Không giới hạn rate (giống host_rate=0 của bản async) để so sánh công bằng
+        limiter = RateLimiter(rate=0)
+        jobs = 0
+        start = time.perf_counter()
+        for page_num in range(1, pages + 1):
+            jobs += len(crawl_one_page(base_url, page_num, session, limiter=limiter))
+        elapsed = time.perf_counter() - start
+        results['http_sync_pages_per_sec'] = pages / elapsed
+        results['http_sync_jobs_per_sec'] = jobs / elapsed
+
+        start = time.perf_counter()
+        jobs_by_category = crawl_all([(base_url, 'bench')], pages=pages,
+                                     concurrency=concurrency, host_rate=0)
+        elapsed = time.perf_counter() - start
+        results['http_async_pages_per_sec'] = pages / elapsed
+        results['http_async_jobs_per_sec'] = len(jobs_by_category['bench']) / elapsed
+    finally:
+        server.shutdown()
+    return results
+
+def compare_baseline(results, baseline, threshold):
+    """Trả về list metric bị chậm hơn baseline quá threshold (tỉ lệ, vd 0.2 = 20%)"""
+    regressions = []
+    for metric, value in results.items():
+        if metric not in baseline:
+            continue
+        base = baseline[metric]
+        # Metric dạng thời gian (_us_per_call, _us_per_row, ...): càng nhỏ càng tốt
+        if '_us_per_' in metric:
+            worse = value > base * (1 + threshold)
+        else:
+            worse = value < base * (1 - threshold)
+        if worse:
+            regressions.append((metric, base, value))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawl/parse trên corpus fixture offline")
+    parser.add_argument('--repeat', type=int, default=20, help="Số lần lặp lại corpus khi benchmark parse")
+    parser.add_argument('--pages', type=int, default=30, help="Số trang fetch qua HTTP local")
+    parser.add_argument('--latency', type=float, default=0.05, help="Độ trễ giả lập mỗi response (giây)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrency cho crawl async")
+    parser.add_argument('--skip-http', action='store_true', help="Chỉ benchmark parse")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="File JSON baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="Ghi kết quả lần chạy này làm baseline")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Ngưỡng regression so với baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    if not corpus:
+        print(f"❌ Không có fixture nào trong {FIXTURES_DIR}")
+        return 1
+    print(f"📂 Corpus: {len(corpus)} trang")
+
+    results = {}
+    results.update(bench_parse(corpus, args.repeat))
+    results.update(bench_fields(corpus, args.repeat))
+    if not args.skip_http:
+        results.update(bench_http(corpus, args.pages, args.latency, args.concurrency))
+
+    for metric, value in results.items():
+        print(f"  {metric:<36} {value:12.2f}")
+    # Chỉ để tham khảo (tăng theo --repeat), không lưu vào baseline và không so sánh
+    for name, info in memo_stats().items():
+        print(f"  memo {name}: {info['hits']} hits / {info['misses']} misses")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Đã lưu baseline vào {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(results, baseline, args.threshold)
+        for metric, base, value in regressions:
+            print(f"❌ Regression {metric}: {base:.2f} -> {value:.2f}")
+        if regressions:
+            return 1
+        print(f"✅ Không có regression vượt {args.threshold:.0%} so với baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from features import (
+    extract_city, experience_level, exp_numeric,
+    API_CITY, API_EXPERIENCE, API_EXP_NUMERIC,
+    DASHBOARD_CITY, DASHBOARD_EXPERIENCE
+)
+
+LOCATIONS = ['Hà Nội', 'Hồ Chí Minh', 'TP Hồ Chí Minh', 'Đà Nẵng', 'Cần Thơ', 'Hải Phòng',
+             'Hà Nội & 2 nơi khác', 'Bình Dương', 'TPHCM', 'N/A', None]
+EXPERIENCES = ['Không yêu cầu', '1 năm', '2 năm', '3 năm', '5 năm', 'Dưới 1 năm', 'Trên 5 năm',
+               'Intern', 'Senior', '1-2 năm', 'N/A', None]
+
+# Bản .apply từng dòng cũ, dùng làm tham chiếu kết quả và tốc độ
+def legacy_city_api(location_text):
+    if pd.isna(location_text):
+        return 'Unknown'
+    cities = ['Hà Nội', 'TP Hồ Chí Minh', 'Đà Nẵng', 'Cần Thơ', 'Hải Phòng', 'Biên Hòa']
+    for city in cities:
+        if city in str(location_text):
+            return city
+    return 'Other'
+
+def legacy_city_dashboard(location):
+    if pd.isna(location):
+        return 'Khác'
+    location = str(location)
+    if 'Hà Nội' in location:
+        return 'Hà Nội'
+    elif 'Hồ Chí Minh' in location or 'TPHCM' in location:
+        return 'TP.HCM'
+    elif 'Đà Nẵng' in location:
+        return 'Đà Nẵng'
+    elif 'Cần Thơ' in location:
+        return 'Cần Thơ'
+    else:
+        return 'Khác'
+
+def legacy_experience_api(exp_text):
+    if pd.isna(exp_text):
+        return 'Unknown'
+    exp_text = str(exp_text).lower()
+    if 'không yêu cầu' in exp_text or 'intern' in exp_text:
+        return 'Entry Level'
+    elif any(x in exp_text for x in ['1 năm', '2 năm', 'junior']):
+        return 'Junior'
+    elif any(x in exp_text for x in ['3 năm', '4 năm', '5 năm', 'senior']):
+        return 'Senior'
+    else:
+        return 'Other'
+
+def legacy_experience_dashboard(exp_text):
+    if pd.isna(exp_text):
+        return 'Không yêu cầu'
+    exp_text = str(exp_text).lower()
+    if 'không yêu cầu' in exp_text or 'intern' in exp_text:
+        return 'Không yêu cầu'
+    elif any(x in exp_text for x in ['1 năm', '2 năm', '1-2', 'junior']):
+        return 'Junior (1-2 năm)'
+    elif any(x in exp_text for x in ['3 năm', '4 năm', '5 năm', '3-5', 'middle']):
+        return 'Middle (3-5 năm)'
+    elif any(x in exp_text for x in ['senior', '6 năm', '7 năm', '8 năm', '5+']):
+        return 'Senior (5+ năm)'
+    else:
+        return 'Khác'
+
+def legacy_exp_numeric(exp_text):
+    if pd.isna(exp_text):
+        return 0
+    exp_str = str(exp_text).lower()
+    if 'không yêu cầu' in exp_str or 'intern' in exp_str:
+        return 0
+    numbers = re.findall(r'\d+', exp_str)
+    if numbers:
+        return int(numbers[0])
+    return 1
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'location': rng.choice(np.array(LOCATIONS, dtype=object), rows),
+        'experience_years': rng.choice(np.array(EXPERIENCES, dtype=object), rows),
+    })
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feature engineering vector hóa so với .apply")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Số dòng dữ liệu giả lập")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"📊 {args.rows:,} dòng")
+
+    cases = [
+        ('city (API)',
+         lambda: df['location'].apply(legacy_city_api),
+         lambda: extract_city(df['location'], **API_CITY)),
+        ('city (dashboard)',
+         lambda: df['location'].apply(legacy_city_dashboard),
+         lambda: extract_city(df['location'], **DASHBOARD_CITY)),
+        ('experience_level (API)',
+         lambda: df['experience_years'].apply(legacy_experience_api),
+         lambda: experience_level(df['experience_years'], **API_EXPERIENCE)),
+        ('experience_level (dashboard)',
+         lambda: df['experience_years'].apply(legacy_experience_dashboard),
+         lambda: experience_level(df['experience_years'], **DASHBOARD_EXPERIENCE)),
+        ('exp_numeric',
+         lambda: df['experience_years'].apply(legacy_exp_numeric),
+         lambda: exp_numeric(df['experience_years'], **API_EXP_NUMERIC)),
+    ]
+
+    all_ok = True
+    print(f"  {'feature':<30} {'apply rows/s':>14} {'vector rows/s':>14} {'speedup':>8}  match")
+    for name, legacy, vectorised in cases:
+        expected, legacy_time = timed(legacy)
+        result, vector_time = timed(vectorised)
+        match = expected.astype(object).equals(result.astype(object))
+        all_ok = all_ok and match
+        print(f"  {name:<30} {args.rows / legacy_time:>14,.0f} {args.rows / vector_time:>14,.0f} "
+              f"{legacy_time / vector_time:>7.1f}x  {'✅' if match else '❌'}")
+    return 0 if all_ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import os
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from parsers import PARSER_BACKENDS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def check_parsers(reference='bs4', repeat=5):
+    """So sánh kết quả các parser backend với bản tham chiếu trên các trang fixture"""
+    pages = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    if not pages:
+        print(f"❌ Không có fixture nào trong {FIXTURES_DIR}")
+        return False
+    
+    print(f"📂 {len(pages)} fixture pages, backends: {list(PARSER_BACKENDS)}")
+    all_ok = True
+    timings = {name: 0.0 for name in PARSER_BACKENDS}
+    
+    for path in pages:
+        with open(path, 'rb') as f:
+            content = f.read()
+        
+        expected = PARSER_BACKENDS[reference](content)
+        for name, parse in PARSER_BACKENDS.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                result = parse(content)
+            timings[name] += (time.perf_counter() - start) / repeat
+            
+            if result != expected:
+                all_ok = False
+                print(f"❌ {name} khác {reference} ở {os.path.basename(path)}")
+                for i, (a, b) in enumerate(zip(expected or [], result or [])):
+                    if a != b:
+                        print(f"  Item {i}: {reference}={a}")
+                        print(f"  Item {i}: {name}={b}")
+                        break
+    
+    for name, total in timings.items():
+        print(f"⏱️  {name}: {total * 1000:.1f} ms cho {len(pages)} trang "
+              f"(x{timings[reference] / total:.1f} so với {reference})")
+    
+    if all_ok:
+        print("✅ Tất cả backend cho kết quả giống nhau")
+    return all_ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_parsers() else 1)
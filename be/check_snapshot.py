@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import pandas as pd
+from snapshot import HAS_PYARROW, clean_for_snapshot, to_arrow_table, load_snapshot
+
+def check_snapshot_roundtrip():
+    """Ghi snapshot nhỏ ra file tạm rồi load lại, kiểm tra kiểu và giá trị các cột (skills phải là list)"""
+    if not HAS_PYARROW:
+        print("❌ pyarrow chưa được cài")
+        return False
+    
+    df = pd.DataFrame({
+        'title': [f"Job {i}" for i in range(100)],
+        'company': [f"Company {i % 7}" for i in range(100)],
+        'salary_avg_million_vnd': [float(i % 40) for i in range(100)],
+        'update_date': ['2025-01-%02d' % (i % 28 + 1) for i in range(100)],
+        'skills': [['Python', 'SQL'][:i % 3] if i % 10 else None for i in range(100)],
+        '_collection': ['jobs'] * 100,
+    })
+    expected_skills = df['skills'].tolist()
+    import pyarrow as pa
+    table = to_arrow_table(clean_for_snapshot(df))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'snapshot.arrow')
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        loaded = load_snapshot(path=path, categorical=False)
+    
+    all_ok = True
+    if len(loaded) != len(df):
+        all_ok = False
+        print(f"❌ Số dòng khác nhau: {len(loaded)} != {len(df)}")
+    not_lists = sum(1 for value in loaded['skills'] if value is not None and not isinstance(value, list))
+    if not_lists:
+        all_ok = False
+        print(f"❌ {not_lists} dòng skills không phải list")
+    elif loaded['skills'].tolist() != expected_skills:
+        all_ok = False
+        print("❌ Giá trị skills khác sau khi round-trip")
+    
+    if all_ok:
+        print("✅ Snapshot round-trip giữ nguyên dữ liệu (skills là list)")
+    return all_ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_snapshot_roundtrip() else 1)
@@ -0,0 +1,155 @@
+"""Aggregation pipelines chạy phía MongoDB cho các chart endpoint.
+
+Mỗi hàm chỉ kéo về kết quả đã group (O(số nhóm)) thay vì toàn bộ document.
+Các cột dẫn xuất (city, experience_level) được group theo giá trị thô trên server
+rồi map + gộp lại bằng pandas trên tập nhóm nhỏ.
+"""
+import pandas as pd
+
+from features import extract_city, experience_level, API_CITY, API_EXPERIENCE, API_SALARY_RANGE
+from schema import SYSTEM_COLLECTIONS
+
+# Phải khớp với pd.cut trong preprocess_data (khoảng đóng bên phải, 0 bị loại)
+SALARY_BINS = API_SALARY_RANGE['bins']
+SALARY_LABELS = API_SALARY_RANGE['labels']
+
+# Tương đương pd.to_numeric(..., errors='coerce').fillna(0)
+SALARY_EXPR = {'$convert': {'input': '$salary_avg_million_vnd', 'to': 'double', 'onError': 0, 'onNull': 0}}
+
+# Tương đương pd.to_datetime(..., errors='coerce')
+DATE_EXPR = {'$convert': {'input': '$update_date', 'to': 'date', 'onError': None, 'onNull': None}}
+
+
+def salary_range_expr():
+    """$switch chia salary vào các khoảng giống pd.cut (low, high]"""
+    branches = []
+    for low, high, label in zip(SALARY_BINS[:-1], SALARY_BINS[1:], SALARY_LABELS):
+        conditions = [{'$gt': [SALARY_EXPR, low]}]
+        if high != float('inf'):
+            conditions.append({'$lte': [SALARY_EXPR, high]})
+        branches.append({'case': {'$and': conditions}, 'then': label})
+    return {'$switch': {'branches': branches, 'default': None}}
+
+
+def category_expr(coll_name, fill_category):
+    # get_data_from_db gán category = tên collection khi load tất cả collections
+    return {'$ifNull': ['$category', coll_name]} if fill_category else '$category'
+
+
+def run_pipeline(db, collection_name, build_pipeline):
+    """Chạy pipeline trên một collection hoặc mọi collection, trả về list các nhóm"""
+    if collection_name:
+        names = [collection_name]
+        fill_category = False
+    else:
+        names = [name for name in db.list_collection_names() if name not in SYSTEM_COLLECTIONS]
+        fill_category = True
+
+    rows = []
+    for coll_name in names:
+        pipeline = build_pipeline(category_expr(coll_name, fill_category))
+        for doc in db[coll_name].aggregate(pipeline, allowDiskUse=True):
+            row = dict(doc.pop('_id'))
+            row.update(doc)
+            rows.append(row)
+    return rows
+
+
+def aggregate_skills(db, collection_name=None, limit=20):
+    """Top skills: $unwind + $group trên server"""
+    def build(category):
+        return [
+            {'$match': {'skills': {'$ne': None}}},
+            {'$unwind': '$skills'},
+            {'$group': {'_id': {'skill': '$skills'}, 'count': {'$sum': 1}}}
+        ]
+
+    rows = run_pipeline(db, collection_name, build)
+    if not rows:
+        return []
+
+    # Gộp kết quả giữa các collection
+    counts = pd.DataFrame(rows).groupby('skill', sort=False)['count'].sum()
+    return sorted(counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+
+def aggregate_treemap_sunburst(db, collection_name=None):
+    """Dữ liệu treemap (category, city) và sunburst (category, experience_level, salary_range)"""
+    def build_treemap(category):
+        return [
+            {'$group': {
+                '_id': {'category': category, 'location': '$location'},
+                'rows': {'$sum': 1},
+                'titled': {'$sum': {'$cond': [{'$ifNull': ['$title', False]}, 1, 0]}},
+                'salary_sum': {'$sum': SALARY_EXPR}
+            }}
+        ]
+
+    def build_sunburst(category):
+        return [
+            {'$group': {
+                '_id': {
+                    'category': category,
+                    'experience_years': '$experience_years',
+                    'salary_range': salary_range_expr()
+                },
+                'count': {'$sum': 1}
+            }}
+        ]
+
+    treemap_rows = pd.DataFrame(run_pipeline(db, collection_name, build_treemap),
+                                columns=['category', 'location', 'rows', 'titled', 'salary_sum'])
+    treemap_rows['city'] = extract_city(treemap_rows['location'], **API_CITY)
+    treemap_data = treemap_rows.groupby(['category', 'city']).agg(
+        salary_sum=('salary_sum', 'sum'),
+        rows=('rows', 'sum'),
+        job_count=('titled', 'sum')
+    ).reset_index()
+    treemap_data['avg_salary'] = treemap_data['salary_sum'] / treemap_data['rows']
+    treemap_data = treemap_data[['category', 'city', 'avg_salary', 'job_count']]
+    treemap_data = treemap_data[treemap_data['job_count'] > 0]
+
+    sunburst_rows = pd.DataFrame(run_pipeline(db, collection_name, build_sunburst),
+                                 columns=['category', 'experience_years', 'salary_range', 'count'])
+    sunburst_rows['experience_level'] = experience_level(sunburst_rows['experience_years'], **API_EXPERIENCE)
+    sunburst_rows['salary_range'] = pd.Categorical(sunburst_rows['salary_range'],
+                                                   categories=SALARY_LABELS, ordered=True)
+    sunburst_data = sunburst_rows.groupby(['category', 'experience_level', 'salary_range'],
+                                          observed=True)['count'].sum().reset_index()
+    sunburst_data = sunburst_data[sunburst_data['count'] > 0]
+
+    return treemap_data, sunburst_data
+
+
+def aggregate_jobs_trend(db, collection_name=None):
+    """Số job và lương TB theo tuần (tuần bắt đầu thứ Hai, giống to_period('W'))"""
+    def build(category):
+        return [
+            {'$project': {
+                'week': {'$dateTrunc': {'date': DATE_EXPR, 'unit': 'week', 'startOfWeek': 'monday'}},
+                'category': category,
+                'salary': SALARY_EXPR
+            }},
+            {'$match': {'week': {'$ne': None}}},
+            {'$group': {
+                '_id': {'week': '$week', 'category': '$category'},
+                'count': {'$sum': 1},
+                'salary_sum': {'$sum': {'$cond': [{'$gt': ['$salary', 0]}, '$salary', 0]}},
+                'salary_count': {'$sum': {'$cond': [{'$gt': ['$salary', 0]}, 1, 0]}}
+            }}
+        ]
+
+    rows = pd.DataFrame(run_pipeline(db, collection_name, build),
+                        columns=['week', 'category', 'count', 'salary_sum', 'salary_count'])
+    if rows.empty:
+        return None
+    rows['week'] = pd.to_datetime(rows['week'])
+
+    weekly_jobs = rows.groupby('week')['count'].sum().reset_index(name='count')
+    weekly_category = rows.groupby(['week', 'category'])['count'].sum().reset_index(name='count')
+
+    salary_rows = rows.groupby('week')[['salary_sum', 'salary_count']].sum()
+    salary_rows = salary_rows[salary_rows['salary_count'] > 0]
+    salary_trend = (salary_rows['salary_sum'] / salary_rows['salary_count']).reset_index(name='salary_avg_million_vnd')
+
+    return weekly_jobs, weekly_category, salary_trend
@@ -12,6 +12,11 @@ from datetime import datetime, timedelta
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import LabelEncoder
 import re
+from schema import load_jobs
+from features import (
+    extract_city, experience_level, exp_numeric, salary_range,
+    API_CITY, API_EXPERIENCE, API_EXP_NUMERIC, API_SALARY_RANGE
+)
 from typing import List, Dict, Any
 
 app = FastAPI(title="Job Data Analytics API", version="1.0.0")
@@ -36,34 +41,9 @@ except Exception as e:
 def get_data_from_db(collection_name=None):
     """Lấy dữ liệu từ MongoDB và chuyển đổi thành DataFrame"""
     try:
-        all_data = []
-        
-        if collection_name:
-            # Lấy từ collection cụ thể
-            collection = db[collection_name]
-            data = list(collection.find({}))
-            all_data.extend(data)
-        else:
-            # Lấy từ tất cả collections
-            collections = db.list_collection_names()
-            print(f"Found collections: {collections}")
-            
-            for coll_name in collections:
-                collection = db[coll_name]
-                data = list(collection.find({}))
-                # Thêm collection name vào data nếu chưa có category
-                for doc in data:
-                    if 'category' not in doc:
-                        doc['category'] = coll_name
-                all_data.extend(data)
-        
-        if not all_data:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(all_data)
-        # Xóa cột _id nếu có
-        if '_id' in df.columns:
-            df = df.drop('_id', axis=1)
+        # Chỉ lấy các trường API dùng, dựng DataFrame theo cột với kiểu cố định (schema.py);
+        # khi không chỉ định collection thì category mặc định là tên collection
+        df = load_jobs(db, 'api', collection_name)
         
         print(f"Loaded {len(df)} records from database")
         return df
@@ -86,46 +66,18 @@ def preprocess_data(df):
     
     # Tạo các cột đặc trưng mới
     if 'salary_avg_million_vnd' in df.columns:
-        df['salary_range'] = pd.cut(df['salary_avg_million_vnd'], 
-                                   bins=[0, 10, 20, 30, 50, float('inf')], 
-                                   labels=['<10M', '10-20M', '20-30M', '30-50M', '>50M'])
+        df['salary_range'] = salary_range(df['salary_avg_million_vnd'], **API_SALARY_RANGE)
     
     # Xử lý experience_years
     if 'experience_years' in df.columns:
-        df['experience_level'] = df['experience_years'].apply(categorize_experience)
+        df['experience_level'] = experience_level(df['experience_years'], **API_EXPERIENCE)
     
     # Xử lý location
     if 'location' in df.columns:
-        df['city'] = df['location'].apply(extract_city)
+        df['city'] = extract_city(df['location'], **API_CITY)
     
     return df
 
-def categorize_experience(exp_text):
-    """Phân loại kinh nghiệm"""
-    if pd.isna(exp_text):
-        return 'Unknown'
-    
-    exp_text = str(exp_text).lower()
-    if 'không yêu cầu' in exp_text or 'intern' in exp_text:
-        return 'Entry Level'
-    elif any(x in exp_text for x in ['1 năm', '2 năm', 'junior']):
-        return 'Junior'
-    elif any(x in exp_text for x in ['3 năm', '4 năm', '5 năm', 'senior']):
-        return 'Senior'
-    else:
-        return 'Other'
-
-def extract_city(location_text):
-    """Trích xuất thành phố từ địa chỉ"""
-    if pd.isna(location_text):
-        return 'Unknown'
-    
-    cities = ['Hà Nội', 'TP Hồ Chí Minh', 'Đà Nẵng', 'Cần Thơ', 'Hải Phòng', 'Biên Hòa']
-    for city in cities:
-        if city in str(location_text):
-            return city
-    return 'Other'
-
 # API Endpoints
 @app.get("/")
 async def root():
@@ -262,7 +214,7 @@ async def get_jobs_trend(collection: str = None):
         )
         
         # Area chart - Jobs theo category theo tuần
-        weekly_category = df.groupby(['week', 'category']).size().reset_index(name='count')
+        weekly_category = df.groupby(['week', 'category'], observed=True).size().reset_index(name='count')
         fig_area = px.area(
             weekly_category,
             x='week',
@@ -313,18 +265,7 @@ async def get_salary_location_analysis(collection: str = None):
             return {"error": "No valid data for analysis"}
         
         # Tạo numeric experience từ text
-        def extract_experience_years(exp_text):
-            if pd.isna(exp_text):
-                return 0
-            exp_str = str(exp_text).lower()
-            if 'không yêu cầu' in exp_str or 'intern' in exp_str:
-                return 0
-            numbers = re.findall(r'\d+', exp_str)
-            if numbers:
-                return int(numbers[0])
-            return 1
-        
-        valid_df['exp_numeric'] = valid_df['experience_years'].apply(extract_experience_years)
+        valid_df['exp_numeric'] = exp_numeric(valid_df['experience_years'], **API_EXP_NUMERIC)
         
         # Scatter plot với regression line
         fig_scatter = px.scatter(
@@ -365,27 +306,16 @@ async def get_correlation_heatmap(collection: str = None):
             numeric_features['Lương'] = analysis_df['salary_avg_million_vnd']
         
         # Tạo biến số từ experience
-        def extract_experience_years(exp_text):
-            if pd.isna(exp_text):
-                return 0
-            exp_str = str(exp_text).lower()
-            if 'không yêu cầu' in exp_str or 'intern' in exp_str:
-                return 0
-            numbers = re.findall(r'\d+', exp_str)
-            if numbers:
-                return int(numbers[0])
-            return 1
-        
         if 'experience_years' in analysis_df.columns:
-            numeric_features['Kinh nghiệm (năm)'] = analysis_df['experience_years'].apply(extract_experience_years)
+            numeric_features['Kinh nghiệm (năm)'] = exp_numeric(analysis_df['experience_years'], **API_EXP_NUMERIC)
         
         # Mã hóa categorical variables
         le = LabelEncoder()
         if 'category' in analysis_df.columns:
-            numeric_features['Lĩnh vực (mã)'] = le.fit_transform(analysis_df['category'].fillna('Unknown'))
+            numeric_features['Lĩnh vực (mã)'] = le.fit_transform(analysis_df['category'].astype(object).fillna('Unknown'))
         
         if 'location' in analysis_df.columns:
-            numeric_features['Địa điểm (mã)'] = le.fit_transform(analysis_df['location'].fillna('Unknown'))
+            numeric_features['Địa điểm (mã)'] = le.fit_transform(analysis_df['location'].astype(object).fillna('Unknown'))
         
         # Số lượng skills
         if 'skills' in analysis_df.columns:
@@ -423,7 +353,7 @@ async def get_treemap_sunburst(collection: str = None):
         df = preprocess_data(df)
         
         # Treemap - Phân phối theo category và city
-        treemap_data = df.groupby(['category', 'city']).agg({
+        treemap_data = df.groupby(['category', 'city'], observed=True).agg({
             'salary_avg_million_vnd': 'mean',
             'title': 'count'
         }).reset_index()
@@ -442,7 +372,7 @@ async def get_treemap_sunburst(collection: str = None):
         )
         
         # Sunburst - Cấu trúc phân cấp category -> experience -> salary_range
-        sunburst_data = df.groupby(['category', 'experience_level', 'salary_range']).size().reset_index(name='count')
+        sunburst_data = df.groupby(['category', 'experience_level', 'salary_range'], observed=True).size().reset_index(name='count')
         sunburst_data = sunburst_data[sunburst_data['count'] > 0]
         
         fig_sunburst = px.sunburst(
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pymongo import MongoClient
 import pandas as pd
 import numpy as np
@@ -12,9 +12,19 @@ from datetime import datetime, timedelta
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import LabelEncoder
 import re
+from features import (
+    extract_city, experience_level, exp_numeric, salary_range,
+    API_CITY, API_EXPERIENCE, API_EXP_NUMERIC, API_SALARY_RANGE
+)
 from typing import List, Dict, Any
 import asyncio
 from contextlib import asynccontextmanager
+from cache import snapshot_cache, FigureCache, get_dataset_version
+from schema import load_jobs, SYSTEM_COLLECTIONS
+from ratelimit import rate_limiter
+from aggregations import aggregate_skills, aggregate_treemap_sunburst, aggregate_jobs_trend
+from workers import run_blocking, run_in_process, shutdown_process_pool, executor_stats
+from charts import serialize_payload, encode_frame, render_encoded
 
 # Try to import scheduler, if fails create a dummy
 try:
@@ -31,6 +41,8 @@ async def lifespan(app: FastAPI):
     # Startup
     if SCHEDULER_AVAILABLE and scheduler_instance:
         print("Starting job scheduler...")
+        # Dựng sẵn figure cache ngay sau mỗi lần crawl xong
+        scheduler_instance.add_post_crawl_hook(precompute_charts)
         scheduler_instance.start_scheduler()
     else:
         print("Scheduler not available, skipping...")
@@ -39,6 +51,7 @@ async def lifespan(app: FastAPI):
     if SCHEDULER_AVAILABLE and scheduler_instance:
         print("Stopping job scheduler...")
         scheduler_instance.stop_scheduler()
+    shutdown_process_pool()
 
 app = FastAPI(
     title="Job Data Analytics API", 
@@ -66,34 +79,9 @@ except Exception as e:
 def get_data_from_db(collection_name=None):
     """Lấy dữ liệu từ MongoDB và chuyển đổi thành DataFrame"""
     try:
-        all_data = []
-        
-        if collection_name:
-            # Lấy từ collection cụ thể
-            collection = db[collection_name]
-            data = list(collection.find({}))
-            all_data.extend(data)
-        else:
-            # Lấy từ tất cả collections
-            collections = db.list_collection_names()
-            print(f"Found collections: {collections}")
-            
-            for coll_name in collections:
-                collection = db[coll_name]
-                data = list(collection.find({}))
-                # Thêm collection name vào data nếu chưa có category
-                for doc in data:
-                    if 'category' not in doc:
-                        doc['category'] = coll_name
-                all_data.extend(data)
-        
-        if not all_data:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(all_data)
-        # Xóa cột _id nếu có
-        if '_id' in df.columns:
-            df = df.drop('_id', axis=1)
+        # Chỉ lấy các trường API dùng, dựng DataFrame theo cột với kiểu cố định (schema.py);
+        # khi không chỉ định collection thì category mặc định là tên collection
+        df = load_jobs(db, 'api', collection_name)
         
         print(f"Loaded {len(df)} records from database")
         return df
@@ -116,45 +104,538 @@ def preprocess_data(df):
     
     # Tạo các cột đặc trưng mới
     if 'salary_avg_million_vnd' in df.columns:
-        df['salary_range'] = pd.cut(df['salary_avg_million_vnd'], 
-                                   bins=[0, 10, 20, 30, 50, float('inf')], 
-                                   labels=['<10M', '10-20M', '20-30M', '30-50M', '>50M'])
+        df['salary_range'] = salary_range(df['salary_avg_million_vnd'], **API_SALARY_RANGE)
     
     # Xử lý experience_years
     if 'experience_years' in df.columns:
-        df['experience_level'] = df['experience_years'].apply(categorize_experience)
+        df['experience_level'] = experience_level(df['experience_years'], **API_EXPERIENCE)
     
     # Xử lý location
     if 'location' in df.columns:
-        df['city'] = df['location'].apply(extract_city)
+        df['city'] = extract_city(df['location'], **API_CITY)
     
     return df
 
-def categorize_experience(exp_text):
-    """Phân loại kinh nghiệm"""
-    if pd.isna(exp_text):
-        return 'Unknown'
-    
-    exp_text = str(exp_text).lower()
-    if 'không yêu cầu' in exp_text or 'intern' in exp_text:
-        return 'Entry Level'
-    elif any(x in exp_text for x in ['1 năm', '2 năm', 'junior']):
-        return 'Junior'
-    elif any(x in exp_text for x in ['3 năm', '4 năm', '5 năm', 'senior']):
-        return 'Senior'
+def get_preprocessed_data(collection_name=None):
+    """Lấy DataFrame đã preprocess qua snapshot cache, chỉ load lại khi dữ liệu thay đổi"""
+    try:
+        version = get_dataset_version(db, collection_name)
+    except Exception as e:
+        print(f"Error getting dataset version: {e}")
+        return preprocess_data(get_data_from_db(collection_name))
+    
+    return snapshot_cache.get(
+        collection_name or "all",
+        version,
+        lambda: preprocess_data(get_data_from_db(collection_name))
+    )
+
+def jobs_trend_frames(df):
+    """Pandas fallback của aggregate_jobs_trend"""
+    if 'update_date' not in df.columns or df['update_date'].isna().all():
+        return None
+    
+    # Tạo dữ liệu theo tuần
+    df['week'] = df['update_date'].dt.to_period('W').dt.start_time
+    
+    weekly_jobs = df.groupby('week').size().reset_index(name='count')
+    weekly_category = df.groupby(['week', 'category'], observed=True).size().reset_index(name='count')
+    salary_trend = df[df['salary_avg_million_vnd'] > 0].groupby('week')['salary_avg_million_vnd'].mean().reset_index()
+    return weekly_jobs, weekly_category, salary_trend
+
+def treemap_sunburst_frames(df):
+    """Pandas fallback của aggregate_treemap_sunburst"""
+    treemap_data = df.groupby(['category', 'city'], observed=True).agg({
+        'salary_avg_million_vnd': 'mean',
+        'title': 'count'
+    }).reset_index()
+    treemap_data.columns = ['category', 'city', 'avg_salary', 'job_count']
+    treemap_data = treemap_data[treemap_data['job_count'] > 0]
+    
+    sunburst_data = df.groupby(['category', 'experience_level', 'salary_range'], observed=True).size().reset_index(name='count')
+    sunburst_data = sunburst_data[sunburst_data['count'] > 0]
+    return treemap_data, sunburst_data
+
+def top_skills_from_df(df, limit=20):
+    """Pandas fallback của aggregate_skills"""
+    all_skills = []
+    if 'skills' in df.columns:
+        for skills_list in df['skills'].dropna():
+            if isinstance(skills_list, list):
+                all_skills.extend(skills_list)
+            elif isinstance(skills_list, str):
+                all_skills.append(skills_list)
+    
+    # Tạo skills frequency
+    skills_freq = {}
+    for skill in all_skills:
+        skills_freq[skill] = skills_freq.get(skill, 0) + 1
+    
+    return sorted(skills_freq.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+def render_in_process(name, frames, collection=None):
+    """Gửi các DataFrame đã chuẩn bị sang process pool, nhận về JSON bytes của chart"""
+    encoded_frames = [encode_frame(frame) for frame in frames]
+    return run_in_process(render_encoded, name, encoded_frames, collection if collection else "all")
+
+# Chart builders: trả về payload (dict chứa figure) hoặc JSON bytes cho từng endpoint /api/charts/*
+def build_salary_distribution(collection=None):
+    """1. Histogram/Boxplot/Violin - Phân phối lương theo category"""
+    df = get_preprocessed_data(collection)
+    if df.empty:
+        return {"error": "No data found"}
+    
+    # Lọc dữ liệu lương hợp lệ
+    valid_df = df[df['salary_avg_million_vnd'] > 0].copy()
+    
+    if valid_df.empty:
+        return {"error": "No salary data found"}
+    
+    # Histogram - Phân phối lương tổng thể
+    fig_hist = px.histogram(
+        valid_df,
+        x='salary_avg_million_vnd',
+        nbins=25,
+        title="Phân phối mức lương trong ngành IT",
+        labels={'salary_avg_million_vnd': 'Lương (triệu VNĐ)', 'count': 'Số lượng công việc'},
+        color_discrete_sequence=['#1f77b4']
+    )
+    fig_hist.update_layout(showlegend=False)
+    
+    # Boxplot theo category
+    fig_box = px.box(
+        valid_df,
+        x='category',
+        y='salary_avg_million_vnd',
+        title="So sánh mức lương theo lĩnh vực",
+        labels={'category': 'Lĩnh vực', 'salary_avg_million_vnd': 'Lương (triệu VNĐ)'}
+    )
+    fig_box.update_xaxes(tickangle=45)
+    
+    # Violin plot theo category
+    fig_violin = px.violin(
+        valid_df,
+        x='category',
+        y='salary_avg_million_vnd',
+        title="Phân phối chi tiết mức lương theo lĩnh vực",
+        labels={'category': 'Lĩnh vực', 'salary_avg_million_vnd': 'Lương (triệu VNĐ)'},
+        box=True
+    )
+    fig_violin.update_xaxes(tickangle=45)
+    
+    return {
+        "histogram": fig_hist.to_dict(),
+        "boxplot": fig_box.to_dict(),
+        "violin": fig_violin.to_dict(),
+        "collection_used": collection if collection else "all"
+    }
+
+def build_jobs_trend(collection=None):
+    """2. Line/Area chart - Xu hướng việc làm theo thời gian và category"""
+    try:
+        # Group theo tuần trên MongoDB
+        frames = aggregate_jobs_trend(db, collection)
+    except Exception as e:
+        print(f"Aggregation failed, falling back to pandas: {e}")
+        df = get_preprocessed_data(collection)
+        if df.empty:
+            return {"error": "No data found"}
+        frames = jobs_trend_frames(df)
+    
+    # Kiểm tra dữ liệu thời gian
+    if frames is None:
+        return {"error": "No valid date data found"}
+    
+    weekly_jobs, weekly_category, salary_trend = frames
+    
+    # Line chart - Tổng số job theo tuần
+    fig_line = px.line(
+        weekly_jobs,
+        x='week',
+        y='count',
+        title="Xu hướng số lượng việc làm IT theo tuần",
+        labels={'week': 'Tuần', 'count': 'Số lượng công việc'},
+        markers=True
+    )
+    
+    # Area chart - Jobs theo category theo tuần
+    fig_area = px.area(
+        weekly_category,
+        x='week',
+        y='count',
+        color='category',
+        title="Xu hướng việc làm theo lĩnh vực",
+        labels={'week': 'Tuần', 'count': 'Số lượng công việc', 'category': 'Lĩnh vực'}
+    )
+    
+    # Line chart - Mức lương trung bình theo thời gian
+    fig_salary_trend = px.line(
+        salary_trend,
+        x='week',
+        y='salary_avg_million_vnd',
+        title="Xu hướng mức lương trung bình theo thời gian",
+        labels={'week': 'Tuần', 'salary_avg_million_vnd': 'Lương TB (triệu VNĐ)'},
+        markers=True
+    )
+    
+    return {
+        "jobs_trend": fig_line.to_dict(),
+        "category_trend": fig_area.to_dict(),
+        "salary_trend": fig_salary_trend.to_dict(),
+        "collection_used": collection if collection else "all"
+    }
+
+def build_salary_location_analysis(collection=None):
+    """3. Scatter + Regression - Phân tích mối quan hệ lương, địa điểm, kinh nghiệm"""
+    df = get_preprocessed_data(collection)
+    if df.empty:
+        return {"error": "No data found"}
+    
+    # Lọc dữ liệu hợp lệ
+    valid_df = df[
+        (df['salary_avg_million_vnd'] > 0) & 
+        (df['location'].notna()) & 
+        (df['experience_years'].notna())
+    ].copy()
+    
+    if valid_df.empty:
+        return {"error": "No valid data for analysis"}
+    
+    # Tạo numeric experience từ text
+    valid_df['exp_numeric'] = exp_numeric(valid_df['experience_years'], **API_EXP_NUMERIC)
+    
+    # Scatter plot với regression line (OLS) dựng trong process pool, chỉ gửi các cột cần vẽ
+    scatter_columns = ['exp_numeric', 'salary_avg_million_vnd', 'city', 'title', 'company']
+    return render_in_process("salary-location-analysis", [valid_df[scatter_columns]], collection)
+
+def build_correlation_heatmap(collection=None):
+    """4. Heatmap tương quan - Phân tích tương quan giữa các yếu tố"""
+    df = get_preprocessed_data(collection)
+    if df.empty:
+        return {"error": "No data found"}
+    
+    # Tạo các biến số từ dữ liệu
+    analysis_df = df.copy()
+    
+    # Biến numeric
+    numeric_features = {}
+    if 'salary_avg_million_vnd' in analysis_df.columns:
+        numeric_features['Lương'] = analysis_df['salary_avg_million_vnd']
+    
+    # Tạo biến số từ experience
+    if 'experience_years' in analysis_df.columns:
+        numeric_features['Kinh nghiệm (năm)'] = exp_numeric(analysis_df['experience_years'], **API_EXP_NUMERIC)
+    
+    # Mã hóa categorical variables
+    le = LabelEncoder()
+    if 'category' in analysis_df.columns:
+        numeric_features['Lĩnh vực (mã)'] = le.fit_transform(analysis_df['category'].astype(object).fillna('Unknown'))
+    
+    if 'location' in analysis_df.columns:
+        numeric_features['Địa điểm (mã)'] = le.fit_transform(analysis_df['location'].astype(object).fillna('Unknown'))
+    
+    # Số lượng skills
+    if 'skills' in analysis_df.columns:
+        numeric_features['Số lượng kỹ năng'] = analysis_df['skills'].apply(lambda x: len(x) if isinstance(x, list) else 0)
+    
+    # Tạo DataFrame cho correlation, tính tương quan và vẽ heatmap trong process pool
+    corr_df = pd.DataFrame(numeric_features)
+    return render_in_process("correlation-heatmap", [corr_df], collection)
+
+def build_treemap_sunburst(collection=None):
+    """5. Treemap/Sunburst - Phân phối công việc theo category, location, salary"""
+    try:
+        treemap_data, sunburst_data = aggregate_treemap_sunburst(db, collection)
+    except Exception as e:
+        print(f"Aggregation failed, falling back to pandas: {e}")
+        df = get_preprocessed_data(collection)
+        if df.empty:
+            return {"error": "No data found"}
+        treemap_data, sunburst_data = treemap_sunburst_frames(df)
+    
+    if treemap_data.empty:
+        return {"error": "No data found"}
+    
+    # Treemap + Sunburst dựng trong process pool từ kết quả aggregate
+    return render_in_process("treemap-sunburst", [treemap_data, sunburst_data], collection)
+
+def build_skills_analysis(collection=None):
+    """6. Skills Analysis - Top kỹ năng được yêu cầu nhiều nhất"""
+    try:
+        # Đếm tần suất skills bằng $unwind/$group trên MongoDB
+        top_skills = aggregate_skills(db, collection, limit=20)
+    except Exception as e:
+        print(f"Aggregation failed, falling back to pandas: {e}")
+        df = get_preprocessed_data(collection)
+        if df.empty:
+            return {"error": "No data found"}
+        top_skills = top_skills_from_df(df, limit=20)
+    
+    # Tạo bar chart cho top skills
+    if top_skills:
+        skills_df = pd.DataFrame(top_skills, columns=['skill', 'count'])
+        fig_skills = px.bar(
+            skills_df,
+            x='count',
+            y='skill',
+            orientation='h',
+            title="Top 20 kỹ năng được yêu cầu nhiều nhất",
+            labels={'count': 'Số lượng job yêu cầu', 'skill': 'Kỹ năng'}
+        )
+        fig_skills.update_layout(yaxis={'categoryorder': 'total ascending'})
     else:
-        return 'Other'
+        fig_skills = None
+    
+    return {
+        "skills_chart": fig_skills.to_dict() if fig_skills else None,
+        "skills_data": top_skills,
+        "collection_used": collection if collection else "all"
+    }
 
-def extract_city(location_text):
-    """Trích xuất thành phố từ địa chỉ"""
-    if pd.isna(location_text):
-        return 'Unknown'
+CHART_BUILDERS = {
+    "salary-distribution": build_salary_distribution,
+    "jobs-trend": build_jobs_trend,
+    "salary-location-analysis": build_salary_location_analysis,
+    "correlation-heatmap": build_correlation_heatmap,
+    "treemap-sunburst": build_treemap_sunburst,
+    "skills-analysis": build_skills_analysis,
+}
+
+figure_cache = FigureCache(serialize=serialize_payload)
+
+def render_chart(name, collection=None, version=None):
+    """Bytes JSON của chart, lấy từ figure cache theo dataset version hiện tại"""
+    builder = CHART_BUILDERS[name]
+    if version is None:
+        try:
+            version = get_dataset_version(db, collection)
+        except Exception as e:
+            print(f"Error getting dataset version: {e}")
+            payload = builder(collection)
+            return payload if isinstance(payload, bytes) else serialize_payload(payload)
+    return figure_cache.get((name, collection or "all"), version, lambda: builder(collection))
+
+def prepare_batch(names, collection=None):
+    """Lấy dataset version một lần cho cả batch và load/preprocess dữ liệu trước nếu có chart phải build lại"""
+    try:
+        version = get_dataset_version(db, collection)
+    except Exception as e:
+        print(f"Error getting dataset version: {e}")
+        return None
+    if any(not figure_cache.contains((name, collection or "all"), version) for name in names):
+        get_preprocessed_data(collection)
+    return version
+
+async def render_batch_item(name, collection, version):
+    """JSON bytes của một chart trong batch; lỗi được trả về trong payload của chart đó"""
+    try:
+        return name, await run_blocking(name, render_chart, name, collection, version)
+    except Exception as e:
+        return name, serialize_payload({"error": str(e)})
+
+async def chart_response(name, collection=None):
+    """Build/lấy chart trong thread pool để không block event loop"""
+    try:
+        body = await run_blocking(name, render_chart, name, collection)
+        return Response(content=body, media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def precompute_charts():
+    """Build sẵn mọi chart cho từng collection và cho "all", gọi sau mỗi lần crawl xong"""
+    collections = [None] + [name for name in db.list_collection_names() if name not in SYSTEM_COLLECTIONS]
+    built = 0
+    for collection in collections:
+        for name in CHART_BUILDERS:
+            try:
+                render_chart(name, collection)
+                built += 1
+            except Exception as e:
+                print(f"Error precomputing chart {name} ({collection or 'all'}): {e}")
+    print(f"Precomputed {built} charts for {len(collections)} collections")
+    return built
+
+def collections_info():
+    """API lấy danh sách tất cả collections"""
+    collections = db.list_collection_names()
+    result = []
+    
+    for coll_name in collections:
+        collection = db[coll_name]
+        count = collection.count_documents({})
+        result.append({
+            "name": coll_name,
+            "count": count
+        })
+    
+    return {"collections": result, "total_collections": len(collections)}
+
+def data_summary(collection=None):
+    """API lấy thông tin tổng quan về dữ liệu"""
+    df = get_preprocessed_data(collection)
+    if df.empty:
+        return {"error": "No data found"}
+    
+    summary = {
+        "total_jobs": len(df),
+        "companies": df['company'].nunique() if 'company' in df.columns else 0,
+        "categories": df['category'].nunique() if 'category' in df.columns else 0,
+        "avg_salary": float(df['salary_avg_million_vnd'].mean()) if 'salary_avg_million_vnd' in df.columns else 0,
+        "date_range": {
+            "start": df['update_date'].min().isoformat() if 'update_date' in df.columns and not df['update_date'].isna().all() else None,
+            "end": df['update_date'].max().isoformat() if 'update_date' in df.columns and not df['update_date'].isna().all() else None
+        },
+        "collection_used": collection if collection else "all"
+    }
+    
+    return summary
+
+def crawler_status():
+    """Get crawler status and countdown to next crawl"""
+    if not SCHEDULER_AVAILABLE or not scheduler_instance:
+        # Fallback response when scheduler is not available
+        now = datetime.now()
+        next_crawl = now.replace(hour=9, minute=0, second=0, microsecond=0)
+        if now >= next_crawl:
+            next_crawl += timedelta(days=1)
+        
+        time_diff = next_crawl - now
+        
+        return {
+            "crawl_info": {
+                "next_crawl_time": next_crawl.strftime('%Y-%m-%d %H:%M:%S'),
+                "time_until_crawl": {
+                    "days": time_diff.days,
+                    "hours": time_diff.seconds // 3600,
+                    "minutes": (time_diff.seconds % 3600) // 60,
+                    "seconds": time_diff.seconds % 60,
+                    "total_seconds": int(time_diff.total_seconds())
+                },
+                "crawled_today": False,
+                "current_time": now.strftime('%Y-%m-%d %H:%M:%S')
+            },
+            "statistics": {
+                "last_crawl_date": None,
+                "last_crawl_records": 0,
+                "crawl_status": "scheduler_unavailable",
+                "scheduled_time": "09:00 daily"
+            }
+        }
+    
+    crawl_info = scheduler_instance.get_next_crawl_time()
+    
+    # Get crawler statistics
+    status_doc = scheduler_instance.scheduler_collection.find_one({"type": "daily_crawl"})
     
-    cities = ['Hà Nội', 'TP Hồ Chí Minh', 'Đà Nẵng', 'Cần Thơ', 'Hải Phòng', 'Biên Hòa']
-    for city in cities:
-        if city in str(location_text):
-            return city
-    return 'Other'
+    result = {
+        "crawl_info": crawl_info,
+        "statistics": {
+            "last_crawl_date": status_doc.get('last_crawl_date') if status_doc else None,
+            "last_crawl_records": status_doc.get('last_crawl_records', 0) if status_doc else 0,
+            "crawl_status": status_doc.get('crawl_status', 'unknown') if status_doc else 'unknown',
+            "scheduled_time": "09:00 daily",
+            "last_crawl_duration_s": status_doc.get('last_crawl_duration_s') if status_doc else None,
+            "failed_categories": status_doc.get('failed_categories', []) if status_doc else [],
+            "categories": status_doc.get('categories', []) if status_doc else []
+        }
+    }
+    if status_doc and status_doc.get('run_id'):
+        result["statistics"]["run_id"] = status_doc['run_id']
+        result["statistics"]["tasks"] = scheduler_instance.task_queue.counts(status_doc['run_id'])
+    # Nhịp request hiện tại theo host (rate, in-flight, số lần bị throttle)
+    result["statistics"]["http"] = rate_limiter.stats()
+    
+    return result
+
+def trigger_manual_crawl():
+    """Manually trigger crawl job if not done today"""
+    if not SCHEDULER_AVAILABLE or not scheduler_instance:
+        return {
+            "success": False,
+            "message": "Scheduler service is not available",
+            "error": "scheduler_unavailable"
+        }
+    
+    if scheduler_instance.check_crawled_today():
+        return {
+            "success": False,
+            "message": "Data already crawled today",
+            "next_crawl": scheduler_instance.get_next_crawl_time()
+        }
+    
+    # Trigger manual crawl in background
+    import threading
+    crawl_thread = threading.Thread(target=scheduler_instance.manual_crawl)
+    crawl_thread.start()
+    
+    return {
+        "success": True,
+        "message": "Manual crawl started",
+        "status": "running"
+    }
+
+def jobs_crawled_today():
+    """Get jobs crawled today"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    
+    if not SCHEDULER_AVAILABLE or not scheduler_instance:
+        # Fallback: Get recent jobs from regular database
+        collections = db.list_collection_names()
+        all_recent_jobs = []
+        
+        for coll_name in collections:
+            try:
+                collection = db[coll_name]
+                # Get recent jobs (last 24 hours)
+                yesterday = datetime.now() - timedelta(days=1)
+                recent_jobs = list(collection.find({
+                    "update_date": {"$gte": yesterday}
+                }).limit(10))
+                
+                # Add collection info
+                for job in recent_jobs:
+                    job['_id'] = str(job['_id'])  # Convert ObjectId to string
+                    job['source_collection'] = coll_name
+                
+                all_recent_jobs.extend(recent_jobs)
+            except Exception:
+                continue
+        
+        return {
+            "crawl_date": today,
+            "total_jobs": len(all_recent_jobs),
+            "jobs": all_recent_jobs[:50],  # Limit to 50 for performance
+            "collections_with_data": len(collections),
+            "crawled_today": False,
+            "note": "Scheduler unavailable, showing recent jobs instead"
+        }
+    
+    # Get today's jobs from all collections
+    collections = scheduler_instance.db.list_collection_names()
+    all_today_jobs = []
+    
+    for coll_name in collections:
+        if coll_name not in SYSTEM_COLLECTIONS:  # Skip scheduler / task queue collections
+            collection = scheduler_instance.db[coll_name]
+            today_jobs = list(collection.find({
+                "crawl_date": today,
+                "is_today": True
+            }))
+            
+            # Add collection info
+            for job in today_jobs:
+                job['_id'] = str(job['_id'])  # Convert ObjectId to string
+                job['source_collection'] = coll_name
+            
+            all_today_jobs.extend(today_jobs)
+    
+    return {
+        "crawl_date": today,
+        "total_jobs": len(all_today_jobs),
+        "jobs": all_today_jobs[:50],  # Limit to 50 for performance
+        "collections_with_data": len([c for c in collections if c not in SYSTEM_COLLECTIONS]),
+        "crawled_today": scheduler_instance.check_crawled_today() if scheduler_instance else False
+    }
 
 # API Endpoints
 @app.get("/")
@@ -165,18 +646,7 @@ async def root():
 async def get_collections():
     """API lấy danh sách tất cả collections"""
     try:
-        collections = db.list_collection_names()
-        result = []
-        
-        for coll_name in collections:
-            collection = db[coll_name]
-            count = collection.count_documents({})
-            result.append({
-                "name": coll_name,
-                "count": count
-            })
-        
-        return {"collections": result, "total_collections": len(collections)}
+        return await run_blocking("collections", collections_info)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -184,359 +654,89 @@ async def get_collections():
 async def get_data_summary(collection: str = None):
     """API lấy thông tin tổng quan về dữ liệu"""
     try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        df = preprocess_data(df)
-        
-        summary = {
-            "total_jobs": len(df),
-            "companies": df['company'].nunique() if 'company' in df.columns else 0,
-            "categories": df['category'].nunique() if 'category' in df.columns else 0,
-            "avg_salary": float(df['salary_avg_million_vnd'].mean()) if 'salary_avg_million_vnd' in df.columns else 0,
-            "date_range": {
-                "start": df['update_date'].min().isoformat() if 'update_date' in df.columns and not df['update_date'].isna().all() else None,
-                "end": df['update_date'].max().isoformat() if 'update_date' in df.columns and not df['update_date'].isna().all() else None
-            },
-            "collection_used": collection if collection else "all"
-        }
-        
-        return summary
+        return await run_blocking("summary", data_summary, collection)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/charts/salary-distribution")
 async def get_salary_distribution(collection: str = None):
     """1. Histogram/Boxplot/Violin - Phân phối lương theo category"""
-    try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        df = preprocess_data(df)
-        
-        # Lọc dữ liệu lương hợp lệ
-        valid_df = df[df['salary_avg_million_vnd'] > 0].copy()
-        
-        if valid_df.empty:
-            return {"error": "No salary data found"}
-        
-        # Histogram - Phân phối lương tổng thể
-        fig_hist = px.histogram(
-            valid_df,
-            x='salary_avg_million_vnd',
-            nbins=25,
-            title="Phân phối mức lương trong ngành IT",
-            labels={'salary_avg_million_vnd': 'Lương (triệu VNĐ)', 'count': 'Số lượng công việc'},
-            color_discrete_sequence=['#1f77b4']
-        )
-        fig_hist.update_layout(showlegend=False)
-        
-        # Boxplot theo category
-        fig_box = px.box(
-            valid_df,
-            x='category',
-            y='salary_avg_million_vnd',
-            title="So sánh mức lương theo lĩnh vực",
-            labels={'category': 'Lĩnh vực', 'salary_avg_million_vnd': 'Lương (triệu VNĐ)'}
-        )
-        fig_box.update_xaxes(tickangle=45)
-        
-        # Violin plot theo category
-        fig_violin = px.violin(
-            valid_df,
-            x='category',
-            y='salary_avg_million_vnd',
-            title="Phân phối chi tiết mức lương theo lĩnh vực",
-            labels={'category': 'Lĩnh vực', 'salary_avg_million_vnd': 'Lương (triệu VNĐ)'},
-            box=True
-        )
-        fig_violin.update_xaxes(tickangle=45)
-        
-        return {
-            "histogram": json.loads(fig_hist.to_json()),
-            "boxplot": json.loads(fig_box.to_json()),
-            "violin": json.loads(fig_violin.to_json()),
-            "collection_used": collection if collection else "all"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await chart_response("salary-distribution", collection)
 
 @app.get("/api/charts/jobs-trend")
 async def get_jobs_trend(collection: str = None):
     """2. Line/Area chart - Xu hướng việc làm theo thời gian và category"""
-    try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        df = preprocess_data(df)
-        
-        # Kiểm tra dữ liệu thời gian
-        if 'update_date' not in df.columns or df['update_date'].isna().all():
-            return {"error": "No valid date data found"}
-        
-        # Tạo dữ liệu theo tuần
-        df['week'] = df['update_date'].dt.to_period('W').dt.start_time
-        
-        # Line chart - Tổng số job theo tuần
-        weekly_jobs = df.groupby('week').size().reset_index(name='count')
-        fig_line = px.line(
-            weekly_jobs,
-            x='week',
-            y='count',
-            title="Xu hướng số lượng việc làm IT theo tuần",
-            labels={'week': 'Tuần', 'count': 'Số lượng công việc'},
-            markers=True
-        )
-        
-        # Area chart - Jobs theo category theo tuần
-        weekly_category = df.groupby(['week', 'category']).size().reset_index(name='count')
-        fig_area = px.area(
-            weekly_category,
-            x='week',
-            y='count',
-            color='category',
-            title="Xu hướng việc làm theo lĩnh vực",
-            labels={'week': 'Tuần', 'count': 'Số lượng công việc', 'category': 'Lĩnh vực'}
-        )
-        
-        # Line chart - Mức lương trung bình theo thời gian
-        salary_trend = df[df['salary_avg_million_vnd'] > 0].groupby('week')['salary_avg_million_vnd'].mean().reset_index()
-        fig_salary_trend = px.line(
-            salary_trend,
-            x='week',
-            y='salary_avg_million_vnd',
-            title="Xu hướng mức lương trung bình theo thời gian",
-            labels={'week': 'Tuần', 'salary_avg_million_vnd': 'Lương TB (triệu VNĐ)'},
-            markers=True
-        )
-        
-        return {
-            "jobs_trend": json.loads(fig_line.to_json()),
-            "category_trend": json.loads(fig_area.to_json()),
-            "salary_trend": json.loads(fig_salary_trend.to_json()),
-            "collection_used": collection if collection else "all"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await chart_response("jobs-trend", collection)
 
 @app.get("/api/charts/salary-location-analysis")
 async def get_salary_location_analysis(collection: str = None):
     """3. Scatter + Regression - Phân tích mối quan hệ lương, địa điểm, kinh nghiệm"""
-    try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        df = preprocess_data(df)
-        
-        # Lọc dữ liệu hợp lệ
-        valid_df = df[
-            (df['salary_avg_million_vnd'] > 0) & 
-            (df['location'].notna()) & 
-            (df['experience_years'].notna())
-        ].copy()
-        
-        if valid_df.empty:
-            return {"error": "No valid data for analysis"}
-        
-        # Tạo numeric experience từ text
-        def extract_experience_years(exp_text):
-            if pd.isna(exp_text):
-                return 0
-            exp_str = str(exp_text).lower()
-            if 'không yêu cầu' in exp_str or 'intern' in exp_str:
-                return 0
-            numbers = re.findall(r'\d+', exp_str)
-            if numbers:
-                return int(numbers[0])
-            return 1
-        
-        valid_df['exp_numeric'] = valid_df['experience_years'].apply(extract_experience_years)
-        
-        # Scatter plot với regression line
-        fig_scatter = px.scatter(
-            valid_df,
-            x='exp_numeric',
-            y='salary_avg_million_vnd',
-            color='city',
-            size='salary_avg_million_vnd',
-            hover_data=['title', 'company'],
-            title="Mối quan hệ giữa Kinh nghiệm và Mức lương theo Địa điểm",
-            labels={'exp_numeric': 'Số năm kinh nghiệm', 'salary_avg_million_vnd': 'Lương (triệu VNĐ)'},
-            trendline="ols"
-        )
-        
-        return {
-            "scatter_regression": json.loads(fig_scatter.to_json()),
-            "collection_used": collection if collection else "all"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await chart_response("salary-location-analysis", collection)
 
 @app.get("/api/charts/correlation-heatmap")
 async def get_correlation_heatmap(collection: str = None):
     """4. Heatmap tương quan - Phân tích tương quan giữa các yếu tố"""
-    try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        df = preprocess_data(df)
-        
-        # Tạo các biến số từ dữ liệu
-        analysis_df = df.copy()
-        
-        # Biến numeric
-        numeric_features = {}
-        if 'salary_avg_million_vnd' in analysis_df.columns:
-            numeric_features['Lương'] = analysis_df['salary_avg_million_vnd']
-        
-        # Tạo biến số từ experience
-        def extract_experience_years(exp_text):
-            if pd.isna(exp_text):
-                return 0
-            exp_str = str(exp_text).lower()
-            if 'không yêu cầu' in exp_str or 'intern' in exp_str:
-                return 0
-            numbers = re.findall(r'\d+', exp_str)
-            if numbers:
-                return int(numbers[0])
-            return 1
-        
-        if 'experience_years' in analysis_df.columns:
-            numeric_features['Kinh nghiệm (năm)'] = analysis_df['experience_years'].apply(extract_experience_years)
-        
-        # Mã hóa categorical variables
-        le = LabelEncoder()
-        if 'category' in analysis_df.columns:
-            numeric_features['Lĩnh vực (mã)'] = le.fit_transform(analysis_df['category'].fillna('Unknown'))
-        
-        if 'location' in analysis_df.columns:
-            numeric_features['Địa điểm (mã)'] = le.fit_transform(analysis_df['location'].fillna('Unknown'))
-        
-        # Số lượng skills
-        if 'skills' in analysis_df.columns:
-            numeric_features['Số lượng kỹ năng'] = analysis_df['skills'].apply(lambda x: len(x) if isinstance(x, list) else 0)
-        
-        # Tạo DataFrame cho correlation
-        corr_df = pd.DataFrame(numeric_features)
-        corr_matrix = corr_df.corr()
-        
-        # Heatmap tương quan
-        fig_heatmap = px.imshow(
-            corr_matrix,
-            text_auto=True,
-            aspect="auto",
-            title="Ma trận tương quan các yếu tố trong dữ liệu việc làm IT",
-            color_continuous_scale="RdBu_r",
-            zmin=-1, zmax=1
-        )
-        
-        return {
-            "correlation_heatmap": json.loads(fig_heatmap.to_json()),
-            "collection_used": collection if collection else "all"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await chart_response("correlation-heatmap", collection)
 
 @app.get("/api/charts/treemap-sunburst")
 async def get_treemap_sunburst(collection: str = None):
     """5. Treemap/Sunburst - Phân phối công việc theo category, location, salary"""
-    try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        df = preprocess_data(df)
-        
-        # Treemap - Phân phối theo category và city
-        treemap_data = df.groupby(['category', 'city']).agg({
-            'salary_avg_million_vnd': 'mean',
-            'title': 'count'
-        }).reset_index()
-        treemap_data.columns = ['category', 'city', 'avg_salary', 'job_count']
-        treemap_data = treemap_data[treemap_data['job_count'] > 0]
-        
-        fig_treemap = px.treemap(
-            treemap_data,
-            path=[px.Constant("Việc làm IT"), 'category', 'city'],
-            values='job_count',
-            color='avg_salary',
-            hover_data=['avg_salary'],
-            title="Phân phối việc làm theo lĩnh vực và địa điểm",
-            color_continuous_scale='Viridis',
-            labels={'avg_salary': 'Lương TB (triệu VNĐ)', 'job_count': 'Số lượng job'}
-        )
-        
-        # Sunburst - Cấu trúc phân cấp category -> experience -> salary_range
-        sunburst_data = df.groupby(['category', 'experience_level', 'salary_range']).size().reset_index(name='count')
-        sunburst_data = sunburst_data[sunburst_data['count'] > 0]
-        
-        fig_sunburst = px.sunburst(
-            sunburst_data,
-            path=['category', 'experience_level', 'salary_range'],
-            values='count',
-            title="Cấu trúc phân cấp: Lĩnh vực → Kinh nghiệm → Mức lương"
-        )
-        
-        return {
-            "treemap": json.loads(fig_treemap.to_json()),
-            "sunburst": json.loads(fig_sunburst.to_json()),
-            "collection_used": collection if collection else "all"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await chart_response("treemap-sunburst", collection)
 
 @app.get("/api/charts/skills-analysis")
 async def get_skills_analysis(collection: str = None):
     """6. Skills Analysis - Top kỹ năng được yêu cầu nhiều nhất"""
+    return await chart_response("skills-analysis", collection)
+
+@app.get("/api/charts/batch")
+async def get_charts_batch(names: str = Query(None, description="Tên các chart, cách nhau bởi dấu phẩy (mặc định tất cả)"),
+                           collection: str = None, stream: bool = False):
+    """Nhiều chart trong một request: load dữ liệu một lần, build các chart song song.
+
+    stream=true trả về NDJSON, mỗi dòng {"name": ..., "chart": ...} ngay khi chart đó xong.
+    """
+    chart_names = [name.strip() for name in names.split(',') if name.strip()] if names else list(CHART_BUILDERS)
+    unknown = [name for name in chart_names if name not in CHART_BUILDERS]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown charts: {', '.join(unknown)}. Available: {', '.join(CHART_BUILDERS)}")
+    chart_names = list(dict.fromkeys(chart_names))
+    
     try:
-        df = get_data_from_db(collection)
-        if df.empty:
-            return {"error": "No data found"}
-        
-        # WordCloud từ skills
-        all_skills = []
-        if 'skills' in df.columns:
-            for skills_list in df['skills'].dropna():
-                if isinstance(skills_list, list):
-                    all_skills.extend(skills_list)
-                elif isinstance(skills_list, str):
-                    all_skills.append(skills_list)
-        
-        # Tạo skills frequency
-        skills_freq = {}
-        for skill in all_skills:
-            skills_freq[skill] = skills_freq.get(skill, 0) + 1
-        
-        # Top skills
-        top_skills = sorted(skills_freq.items(), key=lambda x: x[1], reverse=True)[:20]
-        
-        # Tạo bar chart cho top skills
-        if top_skills:
-            skills_df = pd.DataFrame(top_skills, columns=['skill', 'count'])
-            fig_skills = px.bar(
-                skills_df,
-                x='count',
-                y='skill',
-                orientation='h',
-                title="Top 20 kỹ năng được yêu cầu nhiều nhất",
-                labels={'count': 'Số lượng job yêu cầu', 'skill': 'Kỹ năng'}
-            )
-            fig_skills.update_layout(yaxis={'categoryorder': 'total ascending'})
-        else:
-            fig_skills = None
-        
-        return {
-            "skills_chart": json.loads(fig_skills.to_json()) if fig_skills else None,
-            "skills_data": top_skills,
-            "collection_used": collection if collection else "all"
-        }
+        version = await run_blocking("batch", prepare_batch, chart_names, collection)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    tasks = [asyncio.ensure_future(render_batch_item(name, collection, version)) for name in chart_names]
+    
+    if stream:
+        async def chart_lines():
+            for finished in asyncio.as_completed(tasks):
+                name, body = await finished
+                yield b'{"name":' + json.dumps(name).encode() + b',"chart":' + body + b'}\n'
+        return StreamingResponse(chart_lines(), media_type="application/x-ndjson")
+    
+    # Ghép thẳng các JSON bytes đã serialize, không parse lại
+    results = await asyncio.gather(*tasks)
+    charts = b','.join(json.dumps(name).encode() + b':' + body for name, body in results)
+    collection_used = json.dumps(collection if collection else "all").encode()
+    return Response(content=b'{"charts":{' + charts + b'},"collection_used":' + collection_used + b'}',
+                    media_type="application/json")
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Thống kê hit/miss của snapshot cache, figure cache và thread pool"""
+    return {
+        "snapshots": snapshot_cache.stats(),
+        "figures": figure_cache.stats(),
+        "executor": executor_stats()
+    }
+
+@app.post("/api/cache/invalidate")
+async def invalidate_caches():
+    """Xóa snapshot cache và figure cache, request sau sẽ build lại từ MongoDB"""
+    snapshot_cache.invalidate()
+    figure_cache.invalidate()
+    return {"success": True}
 
 @app.get("/health")
 async def health_check():
@@ -547,52 +747,7 @@ async def health_check():
 async def get_crawler_status():
     """Get crawler status and countdown to next crawl"""
     try:
-        if not SCHEDULER_AVAILABLE or not scheduler_instance:
-            # Fallback response when scheduler is not available
-            now = datetime.now()
-            next_crawl = now.replace(hour=9, minute=0, second=0, microsecond=0)
-            if now >= next_crawl:
-                next_crawl += timedelta(days=1)
-            
-            time_diff = next_crawl - now
-            
-            return {
-                "crawl_info": {
-                    "next_crawl_time": next_crawl.strftime('%Y-%m-%d %H:%M:%S'),
-                    "time_until_crawl": {
-                        "days": time_diff.days,
-                        "hours": time_diff.seconds // 3600,
-                        "minutes": (time_diff.seconds % 3600) // 60,
-                        "seconds": time_diff.seconds % 60,
-                        "total_seconds": int(time_diff.total_seconds())
-                    },
-                    "crawled_today": False,
-                    "current_time": now.strftime('%Y-%m-%d %H:%M:%S')
-                },
-                "statistics": {
-                    "last_crawl_date": None,
-                    "last_crawl_records": 0,
-                    "crawl_status": "scheduler_unavailable",
-                    "scheduled_time": "09:00 daily"
-                }
-            }
-        
-        crawl_info = scheduler_instance.get_next_crawl_time()
-        
-        # Get crawler statistics
-        status_doc = scheduler_instance.scheduler_collection.find_one({"type": "daily_crawl"})
-        
-        result = {
-            "crawl_info": crawl_info,
-            "statistics": {
-                "last_crawl_date": status_doc.get('last_crawl_date') if status_doc else None,
-                "last_crawl_records": status_doc.get('last_crawl_records', 0) if status_doc else 0,
-                "crawl_status": status_doc.get('crawl_status', 'unknown') if status_doc else 'unknown',
-                "scheduled_time": "09:00 daily"
-            }
-        }
-        
-        return result
+        return await run_blocking("crawler", crawler_status)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -600,30 +755,7 @@ async def get_crawler_status():
 async def manual_trigger_crawl():
     """Manually trigger crawl job if not done today"""
     try:
-        if not SCHEDULER_AVAILABLE or not scheduler_instance:
-            return {
-                "success": False,
-                "message": "Scheduler service is not available",
-                "error": "scheduler_unavailable"
-            }
-        
-        if scheduler_instance.check_crawled_today():
-            return {
-                "success": False,
-                "message": "Data already crawled today",
-                "next_crawl": scheduler_instance.get_next_crawl_time()
-            }
-        
-        # Trigger manual crawl in background
-        import threading
-        crawl_thread = threading.Thread(target=scheduler_instance.manual_crawl)
-        crawl_thread.start()
-        
-        return {
-            "success": True,
-            "message": "Manual crawl started",
-            "status": "running"
-        }
+        return await run_blocking("crawler", trigger_manual_crawl)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -631,66 +763,7 @@ async def manual_trigger_crawl():
 async def get_today_jobs():
     """Get jobs crawled today"""
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        if not SCHEDULER_AVAILABLE or not scheduler_instance:
-            # Fallback: Get recent jobs from regular database
-            collections = db.list_collection_names()
-            all_recent_jobs = []
-            
-            for coll_name in collections:
-                try:
-                    collection = db[coll_name]
-                    # Get recent jobs (last 24 hours)
-                    yesterday = datetime.now() - timedelta(days=1)
-                    recent_jobs = list(collection.find({
-                        "update_date": {"$gte": yesterday}
-                    }).limit(10))
-                    
-                    # Add collection info
-                    for job in recent_jobs:
-                        job['_id'] = str(job['_id'])  # Convert ObjectId to string
-                        job['source_collection'] = coll_name
-                    
-                    all_recent_jobs.extend(recent_jobs)
-                except Exception:
-                    continue
-            
-            return {
-                "crawl_date": today,
-                "total_jobs": len(all_recent_jobs),
-                "jobs": all_recent_jobs[:50],  # Limit to 50 for performance
-                "collections_with_data": len(collections),
-                "crawled_today": False,
-                "note": "Scheduler unavailable, showing recent jobs instead"
-            }
-        
-        # Get today's jobs from all collections
-        collections = scheduler_instance.db.list_collection_names()
-        all_today_jobs = []
-        
-        for coll_name in collections:
-            if coll_name != "scheduler_status":  # Skip scheduler collection
-                collection = scheduler_instance.db[coll_name]
-                today_jobs = list(collection.find({
-                    "crawl_date": today,
-                    "is_today": True
-                }))
-                
-                # Add collection info
-                for job in today_jobs:
-                    job['_id'] = str(job['_id'])  # Convert ObjectId to string
-                    job['source_collection'] = coll_name
-                
-                all_today_jobs.extend(today_jobs)
-        
-        return {
-            "crawl_date": today,
-            "total_jobs": len(all_today_jobs),
-            "jobs": all_today_jobs[:50],  # Limit to 50 for performance
-            "collections_with_data": len([c for c in collections if c != "scheduler_status"]),
-            "crawled_today": scheduler_instance.check_crawled_today() if scheduler_instance else False
-        }
+        return await run_blocking("crawler", jobs_crawled_today)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
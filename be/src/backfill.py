@@ -0,0 +1,205 @@
+"""Backfill lịch sử: crawl trang 1..N của mỗi category trong crawl.urls.
+
+Mỗi (category, page) là một task trong hàng đợi crawl_tasks (task_queue.py) nên tiến độ
+được checkpoint sau từng trang: dừng giữa chừng (Ctrl+C, hết budget, process chết) rồi
+chạy lại cùng lệnh chỉ crawl các trang chưa xong. Tổng số request của một lần chạy bị
+giới hạn bởi --budget; tốc độ request do rate limiter theo host (ratelimit.py) quyết định,
+tự giảm khi gặp 429/5xx hoặc latency cao và tăng dần lại khi site phản hồi tốt.
+"""
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime
+
+from crawl import (parse_jobs_page, save_to_mongo, listing_params, get_mongo_client,
+                   user_agents, urls)
+from task_queue import CrawlTaskQueue, QUEUE_COLLECTION, worker_name
+from page_archive import PageArchive, ARCHIVE_COLLECTION, fetch_page
+from ratelimit import (RateLimiter, rate_limiter, make_session, DEFAULT_RATE, DEFAULT_MAX_RATE,
+                       DEFAULT_TARGET_LATENCY)
+from snapshot import export_snapshot
+
+REQUEST_TIMEOUT = 15
+
+
+class RequestBudget:
+    """Tổng số request tối đa của một lần chạy (None = không giới hạn)"""
+
+    def __init__(self, total=None):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.remaining is None:
+                return True
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def refund(self):
+        with self._lock:
+            if self.remaining is not None:
+                self.remaining += 1
+
+
+_stats_lock = threading.Lock()
+
+
+def count(stats, **increments):
+    """Cộng dồn stats dùng chung giữa các worker"""
+    with _stats_lock:
+        stats.update(increments)
+
+
+def process_task(task, queue, session, limiter, archive, stats, fetched_at=None):
+    """Tải một trang (conditional GET qua archive), lưu job; trang rỗng => category đã hết,
+    bỏ các trang sau. fetched_at là mốc tính ngày đăng (lúc bắt đầu backfill)"""
+    start = time.monotonic()
+    try:
+        response, content = fetch_page(session, task['base_url'], task['page'], listing_params(task['page']),
+                                       {'User-Agent': random.choice(user_agents)}, archive,
+                                       task['category'], limiter, timeout=REQUEST_TIMEOUT)
+    except Exception as e:
+        count(stats, errors=1)
+        queue.fail(task, e)
+        return
+    latency = time.monotonic() - start
+    count(stats, requests=1, **{f'http_{response.status_code}': 1})
+
+    if response.status_code == 429 or response.status_code >= 500:
+        queue.fail(task, f"HTTP {response.status_code}")
+        return
+    if content is None:
+        # Giống hệt lần tải trước (304 hoặc cùng body hash): job đã được lưu từ lần đó
+        count(stats, unchanged=1)
+        previous = archive.latest(task['base_url'], task['page']) or {}
+        jobs = None if previous.get('jobs', 1) else []
+    else:
+        try:
+            response.raise_for_status()
+            jobs = parse_jobs_page(content, task['page'], fetched_at=fetched_at)
+        except Exception as e:
+            count(stats, errors=1)
+            queue.fail(task, e)
+            return
+
+    if jobs is None:
+        queue.complete(task, {'fetched': 0, 'records': 0, 'unchanged': True, 'latency_s': round(latency, 3)})
+        return
+    if not jobs:
+        archive.record_jobs(task['base_url'], task['page'], 0)
+        skipped = queue.skip_after(task['run_id'], task['category'], task['page'])
+        queue.complete(task, {'fetched': 0, 'records': 0, 'latency_s': round(latency, 3)})
+        print(f"Category {task['category']}: hết trang ở page {task['page']}, bỏ {skipped} trang sau")
+        return
+
+    for job in jobs:
+        job['category'] = task['category']
+    try:
+        records = save_to_mongo(jobs, raise_errors=True)
+    except Exception as e:
+        count(stats, errors=1)
+        queue.fail(task, e)
+        return
+    # Chỉ đánh dấu trang đã xử lý sau khi lưu xong, lỗi trước đó thì lần sau parse lại
+    archive.record_jobs(task['base_url'], task['page'], len(jobs))
+    count(stats, pages=1, records=records)
+    queue.complete(task, {'fetched': len(jobs), 'records': records, 'latency_s': round(latency, 3)})
+
+
+def backfill_worker(queue, run_id, limiter, archive, budget, stats, stop, fetched_at=None):
+    """Lease và xử lý task cho tới khi hết task, hết budget hoặc bị dừng"""
+    owner = worker_name()
+    session = make_session()
+    try:
+        while not stop.is_set():
+            if not budget.take():
+                stop.set()
+                return
+            task = queue.lease(run_id, owner)
+            if task is None:
+                budget.refund()
+                next_at = queue.next_available_at(run_id)
+                if next_at is None:
+                    return
+                # Task đang backoff hoặc đang được worker khác xử lý
+                time.sleep(min(max((next_at - datetime.now()).total_seconds(), 0.1), 1.0))
+                continue
+            process_task(task, queue, session, limiter, archive, stats, fetched_at)
+    finally:
+        session.close()
+
+
+def run_backfill(pages, run_id=None, categories=None, budget=None, workers=2, limiter=None, db_name='job_data'):
+    """Crawl trang 1..pages của các category, trả về (counts task theo trạng thái, stats request)"""
+    run_id = run_id or f"backfill-{pages}p"
+    url_list = [(base_url, name) for base_url, name in urls if not categories or name in categories]
+    queue = CrawlTaskQueue(get_mongo_client()[db_name][QUEUE_COLLECTION])
+    archive = PageArchive(get_mongo_client()[db_name][ARCHIVE_COLLECTION])
+    limiter = limiter or rate_limiter
+    added = queue.enqueue(run_id, [(base_url, name, page)
+                                   for base_url, name in url_list for page in range(1, pages + 1)])
+    counts = queue.counts(run_id)
+    print(f"🎯 {run_id}: {len(url_list)} category x {pages} trang, {added} task mới, "
+          f"{counts['done']} đã xong, {counts['pending'] + counts['leased']} còn lại")
+
+    stats = Counter()
+    stop = threading.Event()
+    shared_budget = RequestBudget(budget)
+    # Mọi trang của lần backfill tính ngày đăng theo cùng một mốc
+    started_at = datetime.now()
+    threads = [
+        threading.Thread(target=backfill_worker,
+                         args=(queue, run_id, limiter, archive, shared_budget, stats, stop, started_at),
+                         name=f'backfill-{i}', daemon=True)
+        for i in range(workers)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=30)
+            counts = queue.counts(run_id)
+            print(f"[{time.time() - start:.0f}s] done={counts['done']} pending={counts['pending']} "
+                  f"failed={counts['failed']} requests={stats['requests']} records={stats['records']} "
+                  f"http={limiter.stats()}")
+    except KeyboardInterrupt:
+        print("Dừng backfill, các trang chưa xong sẽ được crawl ở lần chạy sau")
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return queue.counts(run_id), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill lịch sử: crawl trang 1..N của mỗi category")
+    parser.add_argument('--pages', type=int, required=True, help="Số trang mỗi category")
+    parser.add_argument('--run-id', default=None, help="ID lần backfill (mặc định backfill-<pages>p); chạy lại cùng ID để tiếp tục")
+    parser.add_argument('--categories', default=None, help="Chỉ backfill các category này, cách nhau bởi dấu phẩy")
+    parser.add_argument('--budget', type=int, default=None, help="Số request tối đa của lần chạy này")
+    parser.add_argument('--workers', type=int, default=2, help="Số worker song song")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Số request/giây ban đầu")
+    parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE, help="Số request/giây tối đa")
+    parser.add_argument('--target-latency', type=float, default=DEFAULT_TARGET_LATENCY,
+                        help="Giảm tốc khi latency vượt ngưỡng này (giây)")
+    args = parser.parse_args()
+
+    categories = [name.strip() for name in args.categories.split(',')] if args.categories else None
+    limiter = RateLimiter(rate=args.rate, max_rate=args.max_rate, target_latency=args.target_latency)
+    counts, stats = run_backfill(args.pages, args.run_id, categories, args.budget, args.workers, limiter)
+    if stats['records']:
+        export_snapshot(get_mongo_client()['job_data'])
+    print(f"Hoàn tất: {dict(counts)}, {stats['requests']} request, {stats['records']} jobs mới, "
+          f"http {limiter.stats()}")
+    if counts['pending'] or counts['leased']:
+        print("Còn trang chưa crawl (hết budget hoặc bị dừng), chạy lại cùng lệnh để tiếp tục")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import json
+import threading
+from datetime import datetime
+
+from schema import SYSTEM_COLLECTIONS
+
+
+class SnapshotCache:
+    """Cache DataFrame đã preprocess theo collection, dùng chung cho mọi endpoint trong process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}  # key -> (version, df)
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def get(self, key, version, loader):
+        """Trả về snapshot của key nếu version khớp, ngược lại gọi loader() để build lại"""
+        # Lock theo key để nhiều request cùng miss chỉ load Mongo một lần
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                with self._lock:
+                    self.hits += 1
+                df = entry[1]
+            else:
+                with self._lock:
+                    self.misses += 1
+                df = loader()
+                if not df.empty:
+                    self._entries[key] = (version, df)
+        # Shallow copy: endpoint được thêm cột (vd 'week') mà không làm bẩn snapshot
+        return df.copy(deep=False)
+
+    def invalidate(self, key=None):
+        """Xóa snapshot của một key hoặc toàn bộ cache"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": {key: {"version": str(version), "rows": len(df)}
+                            for key, (version, df) in self._entries.items()}
+            }
+
+
+class FigureCache:
+    """Cache response JSON (bytes) của các chart theo (endpoint, collection) và dataset version.
+
+    Endpoint trả thẳng bytes đã serialize nên request ở trạng thái ổn định chỉ tốn một lần tra dict,
+    không phải dựng lại figure Plotly và encode JSON.
+    """
+
+    def __init__(self, serialize=None):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}  # (endpoint, collection) -> (version, bytes)
+        self._serialize = serialize or (lambda payload: json.dumps(payload, default=str).encode())
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def get(self, key, version, builder):
+        """Trả về bytes của key nếu version khớp, ngược lại gọi builder() để build lại"""
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                with self._lock:
+                    self.hits += 1
+                return entry[1]
+
+            with self._lock:
+                self.misses += 1
+            payload = builder()
+            # Builder có thể trả về bytes đã serialize sẵn (vd chart dựng trong process pool)
+            body = payload if isinstance(payload, bytes) else self._serialize(payload)
+            # Không cache payload lỗi (vd chưa có dữ liệu) để lần sau build lại
+            if not (isinstance(payload, dict) and 'error' in payload):
+                self._entries[key] = (version, body)
+            return body
+
+    def contains(self, key, version):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] == version
+
+    def invalidate(self, key=None):
+        """Xóa một entry hoặc toàn bộ cache"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": {"/".join(key): {"version": str(version), "bytes": len(body)}
+                            for key, (version, body) in self._entries.items()}
+            }
+
+
+# Bộ đếm version dữ liệu cho các thay đổi không thêm document (vd rederive sửa tại chỗ)
+DATA_VERSION_COLLECTION = 'scheduler_status'
+DATA_VERSION_TYPE = 'data_version'
+
+
+def collection_version(collection):
+    """Version stamp của một collection: (số document, _id lớn nhất)"""
+    count = collection.estimated_document_count()
+    last_doc = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+    return (count, last_doc['_id'] if last_doc else None)
+
+
+def data_version(db):
+    """Số lần dữ liệu job bị sửa tại chỗ (bump_data_version), 0 nếu chưa có"""
+    doc = db[DATA_VERSION_COLLECTION].find_one({'type': DATA_VERSION_TYPE}, {'version': 1})
+    return doc.get('version', 0) if doc else 0
+
+
+def bump_data_version(db):
+    """Tăng version dữ liệu sau khi update document đã có (số document và _id lớn nhất không
+    đổi nên collection_version không nhận ra), để cache ở API / dashboard build lại"""
+    db[DATA_VERSION_COLLECTION].update_one(
+        {'type': DATA_VERSION_TYPE},
+        {'$inc': {'version': 1}, '$set': {'updated_at': datetime.now()}},
+        upsert=True
+    )
+
+
+def get_dataset_version(db, collection_name=None):
+    """Version stamp cho một collection hoặc cho mọi collection job (khi collection_name=None);
+    bỏ qua collection hệ thống (task queue, page archive, ...) vì chúng đổi liên tục khi crawl
+    mà không làm đổi dữ liệu job"""
+    if collection_name:
+        return (collection_version(db[collection_name]), data_version(db))
+    names = sorted(name for name in db.list_collection_names() if name not in SYSTEM_COLLECTIONS)
+    return tuple((name, collection_version(db[name])) for name in names) + ((DATA_VERSION_TYPE, data_version(db)),)
+
+
+# Cache dùng chung cho toàn process
+snapshot_cache = SnapshotCache()
@@ -0,0 +1,115 @@
+"""Dựng figure Plotly cho các chart nặng CPU trong process riêng.
+
+API chuẩn bị dữ liệu (lọc, tính cột số, aggregate) rồi gửi sang worker process chỉ các
+cột cần vẽ, đóng gói dạng Arrow IPC. Worker dựng figure, serialize payload thành JSON bytes
+và trả về, nên nhiều request chart chạy song song trên nhiều core thay vì tranh GIL.
+"""
+import io
+import pickle
+
+import pandas as pd
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def serialize_payload(payload):
+    """Serialize một lần bằng encoder của Plotly (orjson nếu có), không qua json.loads + encoder FastAPI"""
+    return to_json_plotly(payload).encode()
+
+
+def encode_frame(df):
+    """DataFrame -> bytes gọn để gửi sang process khác (Arrow IPC, fallback pickle)"""
+    if not HAS_PYARROW:
+        return pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_frame(data):
+    if not HAS_PYARROW:
+        return pickle.loads(data)
+    return pa.ipc.open_stream(io.BytesIO(data)).read_all().to_pandas()
+
+
+def salary_location_payload(valid_df, collection_used):
+    """Scatter + regression OLS (statsmodels)"""
+    fig_scatter = px.scatter(
+        valid_df,
+        x='exp_numeric',
+        y='salary_avg_million_vnd',
+        color='city',
+        size='salary_avg_million_vnd',
+        hover_data=['title', 'company'],
+        title="Mối quan hệ giữa Kinh nghiệm và Mức lương theo Địa điểm",
+        labels={'exp_numeric': 'Số năm kinh nghiệm', 'salary_avg_million_vnd': 'Lương (triệu VNĐ)'},
+        trendline="ols"
+    )
+    return {
+        "scatter_regression": fig_scatter.to_dict(),
+        "collection_used": collection_used
+    }
+
+
+def correlation_payload(corr_df, collection_used):
+    """Ma trận tương quan + heatmap"""
+    corr_matrix = corr_df.corr()
+    fig_heatmap = px.imshow(
+        corr_matrix,
+        text_auto=True,
+        aspect="auto",
+        title="Ma trận tương quan các yếu tố trong dữ liệu việc làm IT",
+        color_continuous_scale="RdBu_r",
+        zmin=-1, zmax=1
+    )
+    return {
+        "correlation_heatmap": fig_heatmap.to_dict(),
+        "collection_used": collection_used
+    }
+
+
+def treemap_sunburst_payload(treemap_data, sunburst_data, collection_used):
+    """Treemap category/city và sunburst category -> experience -> salary_range"""
+    fig_treemap = px.treemap(
+        treemap_data,
+        path=[px.Constant("Việc làm IT"), 'category', 'city'],
+        values='job_count',
+        color='avg_salary',
+        hover_data=['avg_salary'],
+        title="Phân phối việc làm theo lĩnh vực và địa điểm",
+        color_continuous_scale='Viridis',
+        labels={'avg_salary': 'Lương TB (triệu VNĐ)', 'job_count': 'Số lượng job'}
+    )
+    fig_sunburst = px.sunburst(
+        sunburst_data,
+        path=['category', 'experience_level', 'salary_range'],
+        values='count',
+        title="Cấu trúc phân cấp: Lĩnh vực → Kinh nghiệm → Mức lương"
+    )
+    return {
+        "treemap": fig_treemap.to_dict(),
+        "sunburst": fig_sunburst.to_dict(),
+        "collection_used": collection_used
+    }
+
+
+# Tên chart -> hàm dựng payload, nhận các DataFrame theo đúng thứ tự
+PROCESS_RENDERERS = {
+    "salary-location-analysis": salary_location_payload,
+    "correlation-heatmap": correlation_payload,
+    "treemap-sunburst": treemap_sunburst_payload,
+}
+
+
+def render_encoded(name, encoded_frames, collection_used):
+    """Chạy trong worker process: decode frames, dựng figure, trả về JSON bytes"""
+    frames = [decode_frame(data) for data in encoded_frames]
+    return serialize_payload(PROCESS_RENDERERS[name](*frames, collection_used))
@@ -0,0 +1,147 @@
+import asyncio
+import argparse
+import random
+import time
+
+import httpx
+
+from crawl import (parse_jobs_page, save_to_mongo, filter_new_jobs, listing_params, load_known_keys,
+                   get_mongo_client, user_agents, urls)
+from snapshot import export_snapshot
+from ratelimit import RateLimiter
+
+# Số request đồng thời tối đa trên toàn bộ crawler
+DEFAULT_CONCURRENCY = 8
+# Số request/giây ban đầu cho mỗi host (rate limiter tự tăng/giảm từ đây)
+DEFAULT_HOST_RATE = 2.0
+
+
+async def crawl_one_page_async(client, base_url, page_num, semaphore, limiter):
+    """Bản async của crawl_one_page: cùng params, cùng rate limiter theo host nhưng chỉ chặn request này"""
+    params = listing_params(page_num)
+    host_limiter = limiter.for_url(base_url)
+    max_retries = 3
+    retry_delay = 1
+    for attempt in range(max_retries):
+        headers = {
+            'User-Agent': random.choice(user_agents)
+        }
+        status_code = None
+        try:
+            # Chờ tới lượt của host trước, chỉ giữ slot concurrency trong lúc gọi HTTP
+            await asyncio.sleep(host_limiter.reserve())
+            async with semaphore:
+                host_limiter.started()
+                start = time.monotonic()
+                try:
+                    response = await client.get(base_url, params=params, headers=headers, timeout=10)
+                    status_code = response.status_code
+                finally:
+                    host_limiter.finished(status_code, time.monotonic() - start,
+                                          response.headers.get('Retry-After') if status_code else None)
+            if response.status_code == 429:
+                print(f"429 Too Many Requests trên page {page_num}, attempt {attempt+1}/{max_retries}.")
+                continue
+            response.raise_for_status()
+            # Parse trong thread để không chặn các request khác trên event loop
+            return await asyncio.to_thread(parse_jobs_page, response.content, page_num)
+        except Exception as e:
+            print(f"Lỗi crawl page {page_num} attempt {attempt+1}: {e}")
+            if attempt == max_retries - 1:
+                return []
+            # Lỗi mạng / 5xx đã làm limiter giãn nhịp host; 4xx, lỗi parse thì tự chờ một chút
+            if status_code is not None and status_code < 500:
+                await asyncio.sleep(retry_delay * (2 ** attempt))
+    return []
+
+
+async def crawl_category_async(client, base_url, category_name, pages, semaphore, limiter):
+    """Crawl đồng thời các trang 1..pages của một category"""
+    results = await asyncio.gather(*[
+        crawl_one_page_async(client, base_url, page_num, semaphore, limiter)
+        for page_num in range(1, pages + 1)
+    ])
+    jobs = [job for page_jobs in results for job in page_jobs]
+    for job in jobs:
+        job['category'] = category_name
+    print(f"Category {category_name}: Crawled {len(jobs)} jobs từ {pages} trang.")
+    return jobs
+
+
+async def crawl_category_incremental_async(client, base_url, category_name, known_keys, max_pages, semaphore, limiter):
+    """Bản async của crawl_incremental: đi lần lượt từng trang, dừng khi trang không còn job mới.
+    known_keys dùng chung giữa các category nên chỉ đọc; key mới giữ riêng trong seen"""
+    jobs_new = []
+    seen = set()
+    for page_num in range(1, max_pages + 1):
+        jobs_page = await crawl_one_page_async(client, base_url, page_num, semaphore, limiter)
+        if not jobs_page:
+            break
+
+        new_on_page = filter_new_jobs(jobs_page, category_name, known_keys, remember=False, seen=seen)
+        jobs_new.extend(new_on_page)
+
+        if not new_on_page:
+            break
+    print(f"Category {category_name}: Crawled {len(jobs_new)} jobs mới từ {page_num} trang.")
+    return jobs_new
+
+
+async def crawl_all_async(url_list=None, pages=1, concurrency=DEFAULT_CONCURRENCY, host_rate=DEFAULT_HOST_RATE):
+    """Crawl đồng thời tất cả category, trả về dict {category_name: jobs}"""
+    url_list = url_list or urls
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate=host_rate)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, follow_redirects=True) as client:
+        results = await asyncio.gather(*[
+            crawl_category_async(client, base_url, category_name, pages, semaphore, limiter)
+            for base_url, category_name in url_list
+        ])
+    return {category_name: jobs for (_, category_name), jobs in zip(url_list, results)}
+
+
+async def crawl_all_incremental_async(url_list=None, known_keys=None, max_pages=50,
+                                      concurrency=DEFAULT_CONCURRENCY, host_rate=DEFAULT_HOST_RATE):
+    """Crawl incremental đồng thời giữa các category; known_keys load một lần nếu không truyền vào"""
+    url_list = url_list or urls
+    if known_keys is None:
+        known_keys = load_known_keys()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate=host_rate)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, follow_redirects=True) as client:
+        results = await asyncio.gather(*[
+            crawl_category_incremental_async(client, base_url, category_name, known_keys, max_pages, semaphore, limiter)
+            for base_url, category_name in url_list
+        ])
+    return {category_name: jobs for (_, category_name), jobs in zip(url_list, results)}
+
+
+def crawl_all(url_list=None, pages=1, concurrency=DEFAULT_CONCURRENCY, host_rate=DEFAULT_HOST_RATE):
+    """Wrapper đồng bộ cho crawl_all_async"""
+    return asyncio.run(crawl_all_async(url_list, pages, concurrency, host_rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl TopCV bằng asyncio")
+    parser.add_argument('--pages', type=int, default=1, help="Số trang mỗi category")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Số request đồng thời tối đa")
+    parser.add_argument('--incremental', action='store_true', help="Đi nhiều trang, dừng khi gặp trang toàn job đã có")
+    parser.add_argument('--max-pages', type=int, default=50, help="Số trang tối đa mỗi category ở chế độ incremental")
+    parser.add_argument('--host-rate', type=float, default=DEFAULT_HOST_RATE, help="Số request/giây ban đầu mỗi host (0 = không giới hạn)")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.incremental:
+        jobs_by_category = asyncio.run(crawl_all_incremental_async(
+            max_pages=args.max_pages, concurrency=args.concurrency, host_rate=args.host_rate
+        ))
+    else:
+        jobs_by_category = crawl_all(pages=args.pages, concurrency=args.concurrency, host_rate=args.host_rate)
+    total = 0
+    for category_name, jobs in jobs_by_category.items():
+        total += save_to_mongo(jobs)
+    if total:
+        export_snapshot(get_mongo_client()['job_data'])
+    print(f"Hoàn tất crawl {len(jobs_by_category)} category trong {time.time() - start:.1f}s, {total} jobs mới.")
@@ -0,0 +1,139 @@
+"""Cube tổng hợp sẵn của dữ liệu job cho các bộ lọc trên dashboard.
+
+build_cube() gom DataFrame job thành các ô theo (category, city, experience_level,
+salary_bucket, week), mỗi ô giữ số job, tổng lương, tổng bình phương lương và lương cao
+nhất. Bucket lương rộng SALARY_STEP triệu và tách riêng giá trị nằm đúng trên mốc, nên lọc
+theo khoảng lương có mốc là bội của SALARY_STEP (như slider của dashboard) cho kết quả đúng
+như lọc từng dòng; phân phối job theo bucket đóng vai trò sketch để ước lượng quantile.
+Mọi phép lọc / group trên JobCube chỉ tốn O(số ô) thay vì O(số job).
+"""
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['category', 'city', 'experience_level', 'salary_bucket', 'week']
+MEASURES = {
+    'jobs': 'sum',
+    'salary_sum': 'sum',
+    'salary_sumsq': 'sum',
+    'salary_max': 'max',
+}
+
+# Độ rộng bucket lương (triệu VNĐ), bằng bước của slider lương trên dashboard
+SALARY_STEP = 5
+
+SALARY_COLUMN = 'salary_avg_million_vnd'
+
+
+def salary_bucket(salary, step=SALARY_STEP):
+    """Mã bucket của lương: 2k là đúng k*step, 2k+1 là khoảng (k*step, (k+1)*step)"""
+    index = np.floor(salary / step)
+    on_edge = salary == index * step
+    return (2 * index + np.where(on_edge, 0, 1)).astype(int)
+
+
+def bucket_bounds(low, high, step=SALARY_STEP):
+    """Khoảng mã bucket [first, last] ứng với lương trong [low, high]; chính xác khi low / high
+    là bội của step, ngược lại gồm cả bucket chỉ giao một phần"""
+    first, last = salary_bucket(np.array([low, high], dtype=float), step)
+    return first, last
+
+
+def build_cube(df):
+    """Gom DataFrame job (đã preprocess) thành DataFrame các ô của cube"""
+    if df.empty:
+        return pd.DataFrame(columns=DIMENSIONS + list(MEASURES))
+    salary = pd.to_numeric(df[SALARY_COLUMN], errors='coerce').fillna(0).to_numpy(dtype=float)
+    if 'update_date' in df.columns:
+        week = pd.to_datetime(df['update_date'], errors='coerce').dt.to_period('W').dt.start_time
+    else:
+        week = pd.Series(pd.NaT, index=df.index)
+    frame = pd.DataFrame({
+        'category': df['category'] if 'category' in df.columns else None,
+        'city': df['city'] if 'city' in df.columns else None,
+        'experience_level': df['experience_level'] if 'experience_level' in df.columns else None,
+        'salary_bucket': salary_bucket(salary),
+        'week': week,
+        'jobs': 1,
+        'salary_sum': salary,
+        'salary_sumsq': salary ** 2,
+        'salary_max': salary,
+    }, index=df.index)
+    return frame.groupby(DIMENSIONS, dropna=False, observed=True, sort=False).agg(MEASURES).reset_index()
+
+
+class JobCube:
+    """Truy vấn trên các ô của cube; mỗi phép lọc trả về JobCube mới"""
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(build_cube(df))
+
+    def where(self, **filters):
+        """Lọc theo giá trị của các chiều, bỏ qua filter None hoặc "Tất cả" """
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dimension, value in filters.items():
+            if value is not None and value != 'Tất cả':
+                mask &= (self.cells[dimension] == value).to_numpy()
+        return JobCube(self.cells[mask])
+
+    def salary_between(self, low, high):
+        first, last = bucket_bounds(low, high)
+        return JobCube(self.cells[self.cells['salary_bucket'].between(first, last)])
+
+    def positive_salary(self):
+        """Chỉ các job có lương > 0 (bỏ lương thỏa thuận / không parse được)"""
+        return JobCube(self.cells[self.cells['salary_bucket'] > 0])
+
+    @property
+    def jobs(self):
+        return int(self.cells['jobs'].sum())
+
+    @property
+    def empty(self):
+        return self.jobs == 0
+
+    def mean_salary(self):
+        jobs = self.jobs
+        return float(self.cells['salary_sum'].sum() / jobs) if jobs else 0.0
+
+    def std_salary(self):
+        jobs = self.jobs
+        if not jobs:
+            return 0.0
+        mean = self.cells['salary_sum'].sum() / jobs
+        return float(np.sqrt(max(self.cells['salary_sumsq'].sum() / jobs - mean ** 2, 0.0)))
+
+    def max_salary(self):
+        return float(self.cells['salary_max'].max()) if not self.empty else 0.0
+
+    def quantile(self, q):
+        """Quantile lương ước lượng từ phân phối theo bucket (mỗi bucket lấy lương trung bình
+        của nó), sai số không quá SALARY_STEP"""
+        histogram = self.cells.groupby('salary_bucket')[['jobs', 'salary_sum']].sum().sort_index()
+        histogram = histogram[histogram['jobs'] > 0]
+        if histogram.empty:
+            return 0.0
+        cumulative = histogram['jobs'].cumsum().to_numpy()
+        position = min(np.searchsorted(cumulative, q * cumulative[-1]), len(histogram) - 1)
+        row = histogram.iloc[position]
+        return float(row['salary_sum'] / row['jobs'])
+
+    def by(self, dimensions):
+        """Tổng hợp theo một hoặc nhiều chiều (bỏ giá trị thiếu như value_counts), sắp giảm
+        dần theo số job; có thêm cột salary_mean"""
+        grouped = self.cells.groupby(dimensions, observed=True).agg(MEASURES)
+        grouped = grouped[grouped['jobs'] > 0]
+        grouped['salary_mean'] = grouped['salary_sum'] / grouped['jobs']
+        return grouped.sort_values('jobs', ascending=False)
+
+    def distinct(self, dimension):
+        """Số giá trị khác nhau (khác rỗng) của một chiều"""
+        return len(self.by(dimension))
+
+    def weekly(self):
+        """Số job theo tuần đăng (cột week, count), tăng dần theo tuần"""
+        weekly = self.by('week')['jobs'].sort_index()
+        return weekly.rename('count').rename_axis('week').reset_index()
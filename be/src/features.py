@@ -0,0 +1,126 @@
+"""Feature engineering dùng chung cho API và các dashboard.
+
+Các hàm chỉ tính trên giá trị unique của cột (pd.factorize) bằng các phép vector
+str.contains / str.extract / np.select, rồi map ngược lại theo mã, thay cho .apply
+từng dòng. Mỗi nơi dùng giữ nguyên nhãn riêng của mình qua các preset bên dưới.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Preset cho API (app.py / app_clean.py)
+API_CITY = {
+    'rules': [
+        ('Hà Nội', ['Hà Nội']),
+        ('TP Hồ Chí Minh', ['TP Hồ Chí Minh']),
+        ('Đà Nẵng', ['Đà Nẵng']),
+        ('Cần Thơ', ['Cần Thơ']),
+        ('Hải Phòng', ['Hải Phòng']),
+        ('Biên Hòa', ['Biên Hòa']),
+    ],
+    'default': 'Other',
+    'na_value': 'Unknown',
+}
+API_EXPERIENCE = {
+    'rules': [
+        ('Entry Level', ['không yêu cầu', 'intern']),
+        ('Junior', ['1 năm', '2 năm', 'junior']),
+        ('Senior', ['3 năm', '4 năm', '5 năm', 'senior']),
+    ],
+    'default': 'Other',
+    'na_value': 'Unknown',
+}
+API_EXP_NUMERIC = {'zero_keywords': ['không yêu cầu', 'intern'], 'cap': None}
+API_SALARY_RANGE = {
+    'bins': [0, 10, 20, 30, 50, float('inf')],
+    'labels': ['<10M', '10-20M', '20-30M', '30-50M', '>50M'],
+    'include_lowest': False,
+}
+
+# Preset cho các dashboard Streamlit
+DASHBOARD_CITY = {
+    'rules': [
+        ('Hà Nội', ['Hà Nội']),
+        ('TP.HCM', ['Hồ Chí Minh', 'TPHCM']),
+        ('Đà Nẵng', ['Đà Nẵng']),
+        ('Cần Thơ', ['Cần Thơ']),
+    ],
+    'default': 'Khác',
+    'na_value': 'Khác',
+}
+DASHBOARD_EXPERIENCE = {
+    'rules': [
+        ('Không yêu cầu', ['không yêu cầu', 'intern']),
+        ('Junior (1-2 năm)', ['1 năm', '2 năm', '1-2', 'junior']),
+        ('Middle (3-5 năm)', ['3 năm', '4 năm', '5 năm', '3-5', 'middle']),
+        ('Senior (5+ năm)', ['senior', '6 năm', '7 năm', '8 năm', '5+']),
+    ],
+    'default': 'Khác',
+    'na_value': 'Không yêu cầu',
+}
+DASHBOARD_EXP_NUMERIC = {'zero_keywords': ['không yêu cầu'], 'cap': 20}
+DASHBOARD_SALARY_RANGE = {
+    'bins': [0, 8, 15, 25, 40, 200],
+    'labels': ['< 8M', '8-15M', '15-25M', '25-40M', '40M+'],
+    'include_lowest': False,
+}
+
+
+def factorize_text(series):
+    """Mã hóa cột thành (codes, uniques dạng str); NaN có code -1"""
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Series(uniques, dtype=object).astype(str)
+
+
+def take_with_na(codes, values, na_value, index):
+    """Map kết quả tính trên uniques về từng dòng, code -1 (NaN) nhận na_value"""
+    values = np.append(np.asarray(values, dtype=object), na_value)
+    return pd.Series(values[codes], index=index)
+
+
+def contains_any(text, needles):
+    pattern = '|'.join(re.escape(needle) for needle in needles)
+    return text.str.contains(pattern, regex=True).to_numpy()
+
+
+def match_rules(series, rules, default, na_value, lower=False):
+    """Gán nhãn của rule đầu tiên có chuỗi con khớp (tương đương chuỗi if/elif ... in ...)"""
+    codes, text = factorize_text(series)
+    if lower:
+        text = text.str.lower()
+    conditions = [contains_any(text, needles) for _, needles in rules]
+    labels = np.select(conditions, [label for label, _ in rules], default=default) if rules else \
+        np.full(len(text), default, dtype=object)
+    return take_with_na(codes, labels, na_value, series.index)
+
+
+def extract_city(series, rules=None, default='Other', na_value='Unknown'):
+    """Trích xuất thành phố từ cột location"""
+    rules = API_CITY['rules'] if rules is None else rules
+    return match_rules(series, rules, default, na_value)
+
+
+def experience_level(series, rules=None, default='Other', na_value='Unknown'):
+    """Phân loại kinh nghiệm từ cột experience_years (so khớp không phân biệt hoa thường)"""
+    rules = API_EXPERIENCE['rules'] if rules is None else rules
+    return match_rules(series, rules, default, na_value, lower=True)
+
+
+def exp_numeric(series, zero_keywords=('không yêu cầu', 'intern'), cap=None):
+    """Số năm kinh nghiệm: 0 nếu không yêu cầu, số đầu tiên trong text, ngược lại 1"""
+    codes, text = factorize_text(series)
+    text = text.str.lower()
+    is_zero = contains_any(text, zero_keywords) if zero_keywords else np.zeros(len(text), dtype=bool)
+    first_number = pd.to_numeric(text.str.extract(r'(\d+)', expand=False), errors='coerce').to_numpy()
+    years = np.select([is_zero, ~np.isnan(first_number)], [0, first_number], default=1)
+    if cap is not None:
+        years = np.minimum(years, cap)
+    return take_with_na(codes, years, 0, series.index).astype('int64')
+
+
+def salary_range(series, bins=None, labels=None, include_lowest=False):
+    """Chia khoảng lương bằng pd.cut"""
+    bins = API_SALARY_RANGE['bins'] if bins is None else bins
+    labels = API_SALARY_RANGE['labels'] if labels is None else labels
+    return pd.cut(series, bins=bins, labels=labels, include_lowest=include_lowest)
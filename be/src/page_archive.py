@@ -0,0 +1,202 @@
+"""Archive các trang danh sách job đã tải, dùng cho conditional GET và reparse offline.
+
+Body của mỗi trang được lưu nén gzip theo địa chỉ nội dung (sha256 của body) trong
+PAGE_ARCHIVE_DIR, nên trang giống hệt nhau chỉ lưu một lần. Collection page_archive giữ
+lịch sử theo (url, page): mỗi lần nội dung đổi thêm một document với ETag, Last-Modified,
+body hash và thời điểm tải. Phiên bản chỉ được đánh dấu processed (record_jobs) sau khi job
+của trang đã parse và lưu xong; khi đó crawler mới gửi If-None-Match / If-Modified-Since và
+bỏ qua parse khi nhận 304 hoặc body hash không đổi. Khi parser thay đổi, lệnh
+`python page_archive.py reparse` parse lại toàn bộ lịch sử mà không cần tải lại trang.
+"""
+import os
+import gzip
+import hashlib
+import argparse
+from collections import Counter
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+from ratelimit import limited_get
+
+ARCHIVE_COLLECTION = 'page_archive'
+
+ARCHIVE_DIR = os.getenv(
+    'PAGE_ARCHIVE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'pages')
+)
+
+
+def body_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class PageArchive:
+    """Blob gzip theo hash trên đĩa + lịch sử tải trong MongoDB"""
+
+    def __init__(self, collection, root=ARCHIVE_DIR):
+        self.collection = collection
+        self.root = root
+        self._indexed = False
+
+    def ensure_indexes(self):
+        if self._indexed:
+            return
+        self.collection.create_index([('url', ASCENDING), ('page', ASCENDING), ('fetched_at', DESCENDING)])
+        self._indexed = True
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], f"{digest}.html.gz")
+
+    def latest(self, url, page):
+        """Lần tải gần nhất của (url, page), None nếu chưa có"""
+        return self.collection.find_one({'url': url, 'page': page}, sort=[('fetched_at', DESCENDING)])
+
+    def conditional_headers(self, latest):
+        headers = {}
+        if latest:
+            if latest.get('etag'):
+                headers['If-None-Match'] = latest['etag']
+            if latest.get('last_modified'):
+                headers['If-Modified-Since'] = latest['last_modified']
+        return headers
+
+    def write_blob(self, digest, body):
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        return path
+
+    def read(self, digest):
+        with gzip.open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    def is_processed(self, entry):
+        # Document cũ (trước khi có trường processed) được coi là đã xử lý
+        return bool(entry) and entry.get('processed', True)
+
+    def store(self, url, page, category, body, etag=None, last_modified=None, latest=None, fetched_at=None):
+        """Lưu một lần tải; trả về True nếu cần parse (nội dung khác lần tải trước, hoặc lần
+        tải trước chưa được parse và lưu xong)"""
+        self.ensure_indexes()
+        fetched_at = fetched_at or datetime.now()
+        digest = body_hash(body)
+        if latest and latest.get('body_hash') == digest:
+            self.collection.update_one({'_id': latest['_id']},
+                                       {'$set': {'checked_at': fetched_at, 'etag': etag,
+                                                 'last_modified': last_modified}})
+            return not self.is_processed(latest)
+        self.write_blob(digest, body)
+        self.collection.insert_one({
+            'url': url,
+            'page': page,
+            'category': category,
+            'body_hash': digest,
+            'size': len(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+            'checked_at': fetched_at,
+            'processed': False
+        })
+        return True
+
+    def record_jobs(self, url, page, job_count):
+        """Đánh dấu phiên bản mới nhất của trang đã parse và lưu job xong, kèm số job; gọi sau
+        khi lưu thành công để lần tải sau mới được bỏ qua khi trang không đổi"""
+        latest = self.latest(url, page)
+        if latest:
+            self.collection.update_one({'_id': latest['_id']}, {'$set': {'jobs': job_count, 'processed': True}})
+
+    def touch(self, latest, checked_at=None):
+        """Ghi nhận một lần kiểm tra trả về 304"""
+        self.collection.update_one({'_id': latest['_id']}, {'$set': {'checked_at': checked_at or datetime.now()}})
+
+    def history(self, url=None, category=None, since=None):
+        """Các phiên bản trang đã lưu, cũ tới mới"""
+        query = {}
+        if url:
+            query['url'] = url
+        if category:
+            query['category'] = category
+        if since:
+            query['fetched_at'] = {'$gte': since}
+        return self.collection.find(query).sort([('fetched_at', ASCENDING)])
+
+
+def fetch_page(session, url, page, params, headers, archive, category=None, limiter=None, timeout=10):
+    """Conditional GET một trang qua archive.
+
+    Trả về (response, content): content là None khi trang không đổi so với lần tải trước đã
+    được xử lý xong (304 hoặc cùng body hash) nên không cần parse. Người gọi phải gọi
+    archive.record_jobs() sau khi lưu job của trang.
+    """
+    latest = archive.latest(url, page)
+    # Lần tải trước chưa xử lý xong (lỗi parse / lưu, process chết) thì tải lại toàn bộ trang
+    if archive.is_processed(latest):
+        headers = {**headers, **archive.conditional_headers(latest)}
+    response = limited_get(session, url, limiter, params=params, headers=headers, timeout=timeout)
+    if response.status_code == 304 and latest:
+        archive.touch(latest)
+        return response, None
+    if response.status_code != 200:
+        return response, response.content
+    changed = archive.store(url, page, category, response.content,
+                            etag=response.headers.get('ETag'),
+                            last_modified=response.headers.get('Last-Modified'),
+                            latest=latest)
+    return response, response.content if changed else None
+
+
+def reparse(archive, backend=None, url=None, category=None, save=False):
+    """Parse lại các trang trong archive bằng parser hiện tại (ngày tính theo lúc tải trang)"""
+    # import trong hàm vì crawl.py import module này
+    from crawl import parse_jobs_page, save_to_mongo
+
+    stats = Counter()
+    for entry in archive.history(url, category):
+        try:
+            content = archive.read(entry['body_hash'])
+        except FileNotFoundError:
+            stats['missing_blobs'] += 1
+            continue
+        jobs = parse_jobs_page(content, entry['page'], backend, fetched_at=entry['fetched_at'])
+        for job in jobs:
+            job['category'] = entry.get('category')
+        stats['pages'] += 1
+        stats['jobs'] += len(jobs)
+        if save and jobs:
+            stats['saved'] += save_to_mongo(jobs)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive trang danh sách job")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    reparse_parser = subparsers.add_parser('reparse', help="Parse lại các trang đã lưu")
+    reparse_parser.add_argument('--backend', default=None, help="Parser backend (bs4 / lxml)")
+    reparse_parser.add_argument('--url', default=None, help="Chỉ reparse các trang của URL này")
+    reparse_parser.add_argument('--category', default=None, help="Chỉ reparse category này")
+    reparse_parser.add_argument('--save', action='store_true', help="Lưu job parse được vào MongoDB (upsert)")
+    subparsers.add_parser('stats', help="Thống kê archive")
+    args = parser.parse_args()
+
+    from crawl import get_mongo_client
+    archive = PageArchive(get_mongo_client()['job_data'][ARCHIVE_COLLECTION])
+    if args.command == 'reparse':
+        stats = reparse(archive, args.backend, args.url, args.category, args.save)
+        print(f"Reparse xong: {dict(stats)}")
+    else:
+        versions = archive.collection.count_documents({})
+        pages = len(archive.collection.distinct('url'))
+        size = sum(doc.get('size', 0) for doc in archive.collection.find({}, {'size': 1}))
+        print(f"{versions} phiên bản trang của {pages} URL, {size / 1e6:.1f}MB trước khi nén -> {archive.root}")
+
+
+if __name__ == "__main__":
+    main()
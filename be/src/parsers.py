@@ -0,0 +1,117 @@
+"""Các backend parse HTML trang danh sách job của TopCV.
+
+Mỗi backend nhận nội dung trang (bytes hoặc str) và trả về list dict các trường thô:
+title, company, salary_text, location, experience, update_raw, skills.
+BeautifulSoup là bản tham chiếu; lxml dùng XPath biên dịch sẵn nên nhanh hơn nhiều.
+"""
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree, html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+def parse_items_bs4(content):
+    """Backend tham chiếu: BeautifulSoup + html.parser"""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    job_list = soup.find('div', class_='job-list-search-result')
+    if not job_list:
+        return None
+
+    items = []
+    for item in job_list.find_all('div', class_='job-item-search-result'):
+        title_span = item.select_one('h3.title span[data-toggle="tooltip"]')
+        title = title_span.get('data-original-title', title_span.text.strip()) if title_span else 'N/A'
+
+        company_span = item.select_one('span.company-name')
+        company = company_span.get('data-original-title', company_span.text.strip()) if company_span else 'N/A'
+
+        salary_label = item.select_one('label.title-salary')
+        city_span = item.select_one('label.address span.city-text')
+        exp_span = item.select_one('label.exp span')
+        update_label = item.select_one('label.label-update')
+        tag_as = item.select('div.tag a.item-tag')
+
+        items.append({
+            'title': title,
+            'company': company,
+            'salary_text': salary_label.text.strip() if salary_label else 'N/A',
+            'location': city_span.text.strip() if city_span else 'N/A',
+            'experience': exp_span.text.strip() if exp_span else 'N/A',
+            'update_raw': update_label.text.strip() if update_label else 'N/A',
+            'skills': [a.text.strip() for a in tag_as]
+        })
+    return items
+
+
+if HAS_LXML:
+    def _has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    # XPath tương đương các CSS selector của backend bs4
+    _XP_JOB_LIST = etree.XPath(f"(//div[{_has_class('job-list-search-result')}])[1]")
+    _XP_ITEMS = etree.XPath(f".//div[{_has_class('job-item-search-result')}]")
+    _XP_TITLE = etree.XPath(f"(.//h3[{_has_class('title')}]//span[@data-toggle='tooltip'])[1]")
+    _XP_COMPANY = etree.XPath(f"(.//span[{_has_class('company-name')}])[1]")
+    _XP_SALARY = etree.XPath(f"(.//label[{_has_class('title-salary')}])[1]")
+    _XP_CITY = etree.XPath(f"(.//label[{_has_class('address')}]//span[{_has_class('city-text')}])[1]")
+    _XP_EXP = etree.XPath(f"(.//label[{_has_class('exp')}]//span)[1]")
+    _XP_UPDATE = etree.XPath(f"(.//label[{_has_class('label-update')}])[1]")
+    _XP_TAGS = etree.XPath(f".//div[{_has_class('tag')}]//a[{_has_class('item-tag')}]")
+
+    _UTF8_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+
+def _first_text(xpath, item):
+    found = xpath(item)
+    return found[0].text_content().strip() if found else 'N/A'
+
+
+def _first_tooltip(xpath, item):
+    found = xpath(item)
+    if not found:
+        return 'N/A'
+    return found[0].get('data-original-title', found[0].text_content().strip())
+
+
+def parse_items_lxml(content):
+    """Backend nhanh: lxml + XPath biên dịch sẵn"""
+    if isinstance(content, bytes):
+        root = lxml_html.document_fromstring(content, parser=_UTF8_PARSER)
+    else:
+        root = lxml_html.document_fromstring(content)
+
+    job_list = _XP_JOB_LIST(root)
+    if not job_list:
+        return None
+
+    items = []
+    for item in _XP_ITEMS(job_list[0]):
+        items.append({
+            'title': _first_tooltip(_XP_TITLE, item),
+            'company': _first_tooltip(_XP_COMPANY, item),
+            'salary_text': _first_text(_XP_SALARY, item),
+            'location': _first_text(_XP_CITY, item),
+            'experience': _first_text(_XP_EXP, item),
+            'update_raw': _first_text(_XP_UPDATE, item),
+            'skills': [a.text_content().strip() for a in _XP_TAGS(item)]
+        })
+    return items
+
+
+PARSER_BACKENDS = {'bs4': parse_items_bs4}
+if HAS_LXML:
+    PARSER_BACKENDS['lxml'] = parse_items_lxml
+
+DEFAULT_BACKEND = 'lxml' if HAS_LXML else 'bs4'
+
+
+def get_parser(name=None):
+    """Lấy hàm parse theo tên backend (mặc định lxml nếu đã cài)"""
+    name = name or DEFAULT_BACKEND
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Parser backend không hỗ trợ: {name} (có: {', '.join(PARSER_BACKENDS)})")
+    return PARSER_BACKENDS[name]
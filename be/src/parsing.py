@@ -0,0 +1,129 @@
+"""Parse lương và ngày cập nhật từ text thô của trang danh sách job.
+
+Pattern được compile một lần khi import. Text lương và nhãn "Đăng X ngày trước" lặp lại
+rất nhiều nên kết quả được memo bằng LRU theo text thô; memo ngày còn theo ngày tham
+chiếu. Người gọi truyền mốc tham chiếu (thời điểm tải trang / bắt đầu lần crawl) vào
+parse_update_time, nên mọi job trong một lần chạy được tính theo cùng một mốc, kể cả khi
+lần chạy kéo qua nửa đêm. Các bản *_series parse cả cột (vd khi backfill / re-derive) bằng
+cách chỉ parse giá trị unique rồi map ngược lại.
+"""
+import re
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from features import factorize_text, take_with_na
+
+VND_RANGE = re.compile(r'(\d+(?:,\d+)?)\s*[-–]\s*(\d+(?:,\d+)?)\s*(?:triệu)?')
+USD_RANGE = re.compile(r'(\d+(?:,\d+)?)\s*[-–]\s*(\d+(?:,\d+)?)\s*USD')
+SINGLE_VND = re.compile(r'(\d+(?:,\d+)?)\s*(?:triệu)?')
+
+WHITESPACE = re.compile(r'\s+')
+YEARS_AGO = re.compile(r'(\d+)\s*năm trước')
+MONTHS_AGO = re.compile(r'(\d+)\s*tháng trước')
+WEEKS_AGO = re.compile(r'(\d+)\s*tuần trước')
+DAYS_AGO = re.compile(r'(\d+)\s*ngày trước')
+
+MEMO_SIZE = 8192
+
+@lru_cache(maxsize=MEMO_SIZE)
+def parse_salary(salary_text):
+    """Lương trung bình (triệu VNĐ) từ text lương, 0 nếu thỏa thuận / không parse được"""
+    if not salary_text or 'Thoả thuận' in salary_text or 'N/A' in salary_text:
+        return 0
+    vnd_match = VND_RANGE.search(salary_text)
+    if vnd_match:
+        low, high = map(lambda x: float(x.replace(',', '').replace('.', '')), vnd_match.groups())
+        return (low + high) / 2
+    usd_match = USD_RANGE.search(salary_text)
+    if usd_match:
+        low, high = map(lambda x: float(x.replace(',', '')), usd_match.groups())
+        return (low + high) / 2 * 24
+    single_vnd = SINGLE_VND.search(salary_text)
+    if single_vnd:
+        return float(single_vnd.group(1).replace(',', '').replace('.', ''))
+    return 0
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _update_date(update_text, today):
+    """Ngày đăng (ISO) tính từ ngày tham chiếu today; kết quả chỉ phụ thuộc vào ngày"""
+    text = WHITESPACE.sub(' ', update_text.replace('\n', '').strip())
+
+    if 'hôm nay' in text:
+        return today.isoformat()
+
+    years_match = YEARS_AGO.search(text)
+    if years_match:
+        year = today.year - int(years_match.group(1))
+        # 29/2 lùi về năm không nhuận thì lấy ngày cuối tháng
+        return today.replace(year=year, day=min(today.day, calendar.monthrange(year, today.month)[1])).isoformat()
+
+    months_match = MONTHS_AGO.search(text)
+    if months_match:
+        months = int(months_match.group(1))
+        month = today.month - months
+        year = today.year
+        while month <= 0:
+            month += 12
+            year -= 1
+        # Ngày 29-31 lùi về tháng ngắn hơn thì lấy ngày cuối tháng
+        return today.replace(year=year, month=month, day=min(today.day, calendar.monthrange(year, month)[1])).isoformat()
+
+    weeks_match = WEEKS_AGO.search(text)
+    if weeks_match:
+        return (today - timedelta(weeks=int(weeks_match.group(1)))).isoformat()
+
+    days_match = DAYS_AGO.search(text)
+    if days_match:
+        return (today - timedelta(days=int(days_match.group(1)))).isoformat()
+
+    return None
+
+
+def parse_update_time(update_text, now=None):
+    """Ngày đăng (ISO) từ nhãn "Đăng ... trước"; now là thời điểm tải trang, mặc định là bây giờ"""
+    if not update_text or 'Đăng' not in update_text:
+        return None
+    return _update_date(update_text, (now or datetime.now()).date())
+
+
+def parse_salary_series(salary_text):
+    """parse_salary cho cả cột: chỉ parse giá trị unique; NaN/None cho 0 như parse_salary(None)"""
+    codes, uniques = factorize_text(salary_text)
+    values = [parse_salary(text) for text in uniques]
+    return pd.to_numeric(take_with_na(codes, values, 0, salary_text.index))
+
+
+def parse_update_series(update_raw, now=None):
+    """parse_update_time cho cả cột; now có thể là một mốc chung hoặc Series thời điểm tải
+    (vd cột timestamp) cùng index"""
+    if isinstance(now, pd.Series):
+        dates = pd.to_datetime(now, errors='coerce', format='ISO8601').dt.date
+        keys = pd.DataFrame({'text': update_raw, 'date': dates})
+        unique_keys = keys.drop_duplicates()
+        parsed = {
+            (text, date): parse_update_time(text, datetime.combine(date, datetime.min.time()))
+            if isinstance(text, str) and pd.notna(date) else None
+            for text, date in unique_keys.itertuples(index=False)
+        }
+        return pd.Series([parsed[key] for key in keys.itertuples(index=False)], index=update_raw.index, dtype=object)
+    codes, uniques = factorize_text(update_raw)
+    # dtype object để giữ None (pandas có thể suy ra kiểu string và đổi None thành NaN)
+    values = np.append(np.asarray([parse_update_time(text, now) for text in uniques], dtype=object), None)
+    return pd.Series(values[codes], index=update_raw.index, dtype=object)
+
+
+def memo_clear():
+    parse_salary.cache_clear()
+    _update_date.cache_clear()
+
+
+def memo_stats():
+    return {
+        'salary': parse_salary.cache_info()._asdict(),
+        'update_date': _update_date.cache_info()._asdict()
+    }
@@ -0,0 +1,170 @@
+"""Rate limiter theo host dùng chung cho mọi request HTTP ra ngoài của crawler.
+
+Mỗi host có một token bucket (rate token/giây, tối đa burst token). Rate tự điều chỉnh
+kiểu AIMD từ kết quả của mọi request tới host đó: 429/5xx/lỗi mạng giảm rate một nửa và
+tạm dừng cả host (theo Retry-After nếu có), response chậm giảm 20%, request thành công
+tăng thêm một lượng cố định. Nhờ vậy các worker/category cùng crawl một site chia sẻ một
+nhịp request, chạy nhanh nhất mà site còn chịu được thay vì mỗi request tự sleep riêng.
+rate <= 0 nghĩa là không giới hạn (vd benchmark trên server local): không chờ, không điều chỉnh.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_RATE = float(os.getenv('CRAWL_HOST_RATE', '1.0'))
+DEFAULT_MIN_RATE = 0.1
+DEFAULT_MAX_RATE = float(os.getenv('CRAWL_HOST_MAX_RATE', '4.0'))
+DEFAULT_BURST = 2
+# Tăng rate thêm bao nhiêu request/giây sau mỗi request thành công
+DEFAULT_INCREASE = 0.1
+# Thời gian tạm dừng host sau 429/5xx khi không có Retry-After (giây)
+DEFAULT_COOLDOWN = 5.0
+# Latency (giây) mà trên mức này coi như site đang quá tải
+DEFAULT_TARGET_LATENCY = 3.0
+
+# Số connection keep-alive mỗi host trong một session
+DEFAULT_POOL_SIZE = int(os.getenv('CRAWL_POOL_SIZE', '8'))
+
+
+class HostLimiter:
+    """Token bucket AIMD cho một host; rate <= 0 thì không giới hạn"""
+
+    def __init__(self, rate=DEFAULT_RATE, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE,
+                 burst=DEFAULT_BURST, increase=DEFAULT_INCREASE, cooldown=DEFAULT_COOLDOWN,
+                 target_latency=DEFAULT_TARGET_LATENCY):
+        self.unlimited = rate <= 0
+        self.rate = max(min_rate, rate)
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, self.rate)
+        self.burst = burst
+        self.increase = increase
+        self.cooldown = cooldown
+        self.target_latency = target_latency
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.throttle_events = 0
+        self.slow_responses = 0
+        self.latency_ewma = None
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Giữ một token, trả về số giây cần chờ trước khi gửi request"""
+        if self.unlimited:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def finished(self, status_code, latency, retry_after=None):
+        """Ghi nhận kết quả một request; status_code=None khi lỗi mạng / timeout"""
+        throttled = status_code is None or status_code == 429 or status_code >= 500
+        with self._lock:
+            self.in_flight -= 1
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            if self.unlimited:
+                self.throttle_events += throttled
+            elif throttled:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.throttle_events += 1
+                pause = self.cooldown
+                if retry_after and str(retry_after).isdigit():
+                    pause = max(pause, int(retry_after))
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            elif latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate * 0.8)
+                self.slow_responses += 1
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': None if self.unlimited else round(self.rate, 3),
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'throttle_events': self.throttle_events,
+                'slow_responses': self.slow_responses,
+                'latency_ewma_s': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                'paused_for_s': round(max(0.0, self.paused_until - time.monotonic()), 1)
+            }
+
+
+class RateLimiter:
+    """Tập HostLimiter theo host, tạo lazy với cùng cấu hình"""
+
+    def __init__(self, **host_options):
+        self.host_options = host_options
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimiter(**self.host_options)
+            return self._hosts[host]
+
+    def for_url(self, url):
+        return self.for_host(urlparse(url).netloc)
+
+    @contextmanager
+    def request(self, url):
+        """Chờ tới lượt gửi request tới host của url; yield hàm report(status_code, retry_after)"""
+        limiter = self.for_url(url)
+        time.sleep(limiter.reserve())
+        limiter.started()
+        start = time.monotonic()
+        reported = []
+
+        def report(status_code, retry_after=None):
+            reported.append(True)
+            limiter.finished(status_code, time.monotonic() - start, retry_after)
+
+        try:
+            yield report
+        finally:
+            if not reported:
+                limiter.finished(None, time.monotonic() - start)
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: limiter.stats() for host, limiter in hosts.items()}
+
+
+def limited_get(session, url, limiter=None, **kwargs):
+    """session.get qua rate limiter; exception (timeout, lỗi mạng) được tính là bị throttle"""
+    limiter = limiter or rate_limiter
+    with limiter.request(url) as report:
+        response = session.get(url, **kwargs)
+        report(response.status_code, response.headers.get('Retry-After'))
+    return response
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE):
+    """requests.Session với pool keep-alive cỡ pool_size mỗi host, không tự retry (crawler tự retry)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Limiter dùng chung cho toàn process (scheduler, crawl, backfill)
+rate_limiter = RateLimiter()
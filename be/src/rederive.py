@@ -0,0 +1,204 @@
+"""Tính lại các trường parse (lương, ngày đăng) từ text thô đã lưu trong MongoDB.
+
+Mỗi job lưu kèm salary_text / update_raw bên cạnh salary_avg_million_vnd / update_date,
+nên khi sửa parser (parsing.py) có thể áp dụng ngược cho dữ liệu cũ mà không crawl lại.
+Collection được chia thành các khoảng _id, mỗi khoảng chạy trong một process riêng: đọc
+theo batch, parse cả cột bằng parse_salary_series / parse_update_series (ngày tính theo
+timestamp lúc tải trang) và chỉ ghi lại các trường thay đổi bằng bulk_write unordered.
+"""
+import os
+import time
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import bump_data_version
+from crawl import get_mongo_client, make_unique_key
+from parsing import parse_salary_series, parse_update_series
+from schema import SYSTEM_COLLECTIONS, DEFAULT_BATCH_SIZE
+from snapshot import export_snapshot
+
+DEFAULT_PROCESSES = int(os.getenv('REDERIVE_PROCESSES', str(os.cpu_count() or 1)))
+
+# Trường cần đọc để parse lại và so sánh với giá trị đang lưu
+SOURCE_FIELDS = ['salary_text', 'update_raw', 'timestamp', 'salary_avg_million_vnd', 'update_date',
+                 'title', 'company', 'unique_key']
+
+DUPLICATE_KEY = 11000
+
+
+def id_ranges(collection, parts):
+    """Chia collection thành tối đa parts khoảng [lower, upper) theo _id, cỡ xấp xỉ nhau"""
+    total = collection.count_documents({})
+    if total == 0:
+        return []
+    parts = max(1, min(parts, total))
+    bounds = [None]
+    for i in range(1, parts):
+        doc = next(collection.find({}, {'_id': 1}).sort('_id', 1).skip(total * i // parts).limit(1), None)
+        if doc and doc['_id'] != bounds[-1]:
+            bounds.append(doc['_id'])
+    bounds.append(None)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def range_query(lower, upper):
+    query = {}
+    if lower is not None:
+        query['$gte'] = lower
+    if upper is not None:
+        query['$lt'] = upper
+    return {'_id': query} if query else {}
+
+
+def text_column(frame, field):
+    """Cột dạng object, None cho giá trị thiếu (so sánh được bằng ==)"""
+    if field not in frame:
+        return pd.Series([None] * len(frame), index=frame.index, dtype=object)
+    column = frame[field].astype(object)
+    return column.where(column.notna(), None)
+
+
+def diff_batch(batch):
+    """Parse lại một batch document, trả về (list UpdateOne, Counter thay đổi)"""
+    frame = pd.DataFrame(batch)
+    stats = Counter(scanned=len(frame))
+
+    # Document không có salary_text thì giữ nguyên lương đang lưu (không parse thành 0)
+    salary_text = text_column(frame, 'salary_text')
+    salary = parse_salary_series(salary_text).round(2)
+    old_salary = pd.to_numeric(text_column(frame, 'salary_avg_million_vnd'), errors='coerce')
+    salary_changed = salary_text.notna() & salary.ne(old_salary)
+
+    # Document không có timestamp (không biết lúc tải trang) thì giữ nguyên update_date
+    fetched_at = text_column(frame, 'timestamp')
+    update_date = parse_update_series(text_column(frame, 'update_raw'), fetched_at)
+    old_update_date = text_column(frame, 'update_date')
+    date_changed = fetched_at.notna() & (update_date.fillna('') != old_update_date.fillna(''))
+
+    stats['salary_changed'] = int(salary_changed.sum())
+    stats['update_date_changed'] = int(date_changed.sum())
+
+    operations = []
+    for position in (salary_changed | date_changed).to_numpy().nonzero()[0]:
+        doc = batch[position]
+        changes = {}
+        if salary_changed.iat[position]:
+            changes['salary_avg_million_vnd'] = float(salary.iat[position])
+        if date_changed.iat[position]:
+            changes['update_date'] = update_date.iat[position]
+            # unique_key chứa update_date nên phải tính lại theo
+            if doc.get('unique_key'):
+                changes['unique_key'] = make_unique_key({**doc, 'update_date': changes['update_date']})
+        operations.append(UpdateOne({'_id': doc['_id']}, {'$set': changes}))
+    return operations, stats
+
+
+def write_changes(collection, operations, stats):
+    if not operations:
+        return
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        stats['updated'] += result.modified_count
+    except BulkWriteError as e:
+        # unique_key mới trùng với job đã có: giữ nguyên document đó, các update khác vẫn được ghi
+        errors = e.details.get('writeErrors', [])
+        stats['updated'] += e.details.get('nModified', 0)
+        stats['conflicts'] += sum(1 for error in errors if error.get('code') == DUPLICATE_KEY)
+        stats['errors'] += sum(1 for error in errors if error.get('code') != DUPLICATE_KEY)
+
+
+def rederive_range(db_name, collection_name, lower, upper, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Parse lại các document có _id trong [lower, upper); chạy trong process worker"""
+    collection = get_mongo_client()[db_name][collection_name]
+    spec = {field: 1 for field in SOURCE_FIELDS}
+    cursor = collection.find(range_query(lower, upper), spec, batch_size=batch_size).sort('_id', 1)
+    stats = Counter()
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            break
+        try:
+            operations, batch_stats = diff_batch(batch)
+        except Exception as e:
+            # Một batch lỗi không làm hỏng cả khoảng _id: đếm vào errors rồi đi tiếp
+            print(f"{collection_name}: lỗi batch từ _id {batch[0]['_id']}: {e}")
+            stats['scanned'] += len(batch)
+            stats['errors'] += len(batch)
+            continue
+        stats.update(batch_stats)
+        if not dry_run:
+            write_changes(collection, operations, stats)
+    return stats
+
+
+def rederive_collection(db_name, collection_name, processes=DEFAULT_PROCESSES, batch_size=DEFAULT_BATCH_SIZE,
+                        dry_run=False, executor=None):
+    """Parse lại một collection, chia theo khoảng _id cho các process của executor"""
+    collection = get_mongo_client()[db_name][collection_name]
+    # Chia nhỏ hơn số process để process xong sớm nhận thêm khoảng khác
+    ranges = id_ranges(collection, processes * 4)
+    stats = Counter()
+    if executor is None:
+        for lower, upper in ranges:
+            stats.update(rederive_range(db_name, collection_name, lower, upper, batch_size, dry_run))
+        return stats
+    futures = [executor.submit(rederive_range, db_name, collection_name, lower, upper, batch_size, dry_run)
+               for lower, upper in ranges]
+    for future in as_completed(futures):
+        stats.update(future.result())
+    return stats
+
+
+def rederive(db_name='job_data', collections=None, processes=DEFAULT_PROCESSES, batch_size=DEFAULT_BATCH_SIZE,
+             dry_run=False):
+    """Parse lại các collection job (mặc định mọi collection trừ collection hệ thống), trả về
+    stats theo collection. Có document được ghi thì bump_data_version: update tại chỗ không
+    đổi số document / _id lớn nhất nên cache của API / dashboard không tự nhận ra"""
+    db = get_mongo_client()[db_name]
+    collections = collections or [name for name in db.list_collection_names() if name not in SYSTEM_COLLECTIONS]
+    results = {}
+    if processes <= 1:
+        for name in collections:
+            results[name] = rederive_collection(db_name, name, 1, batch_size, dry_run)
+    else:
+        # spawn: không fork MongoClient của process cha
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for name in collections:
+                results[name] = rederive_collection(db_name, name, processes, batch_size, dry_run, executor)
+    if any(stats['updated'] for stats in results.values()):
+        bump_data_version(db)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính lại lương / ngày đăng từ text thô bằng parser hiện tại")
+    parser.add_argument('--db', default='job_data', help="Database MongoDB")
+    parser.add_argument('--collections', default=None,
+                        help="Các collection cần tính lại, cách nhau bởi dấu phẩy (mặc định tất cả)")
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES, help="Số process song song")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Số document mỗi batch")
+    parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm thay đổi, không ghi vào MongoDB")
+    args = parser.parse_args()
+
+    collections = [name.strip() for name in args.collections.split(',')] if args.collections else None
+    start = time.time()
+    results = rederive(args.db, collections, args.processes, args.batch_size, args.dry_run)
+    for name, stats in results.items():
+        print(f"{name}: {stats['scanned']} jobs, lương đổi {stats['salary_changed']}, "
+              f"ngày đăng đổi {stats['update_date_changed']}, đã ghi {stats['updated']}, "
+              f"trùng key {stats['conflicts']}, lỗi {stats['errors']}")
+    updated = sum(stats['updated'] for stats in results.values())
+    print(f"Hoàn tất trong {time.time() - start:.1f}s{' (dry run)' if args.dry_run else ''}")
+    if updated:
+        export_snapshot(get_mongo_client()[args.db])
+
+
+if __name__ == "__main__":
+    main()
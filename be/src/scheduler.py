@@ -1,12 +1,20 @@
+import os
 import schedule
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import requests
 from pymongo import MongoClient
 import json
 import logging
 from typing import Dict, Any
+from snapshot import export_snapshot
+from cache import get_dataset_version
+import crawl
+from task_queue import CrawlTaskQueue, QUEUE_COLLECTION, DONE, FAILED, worker_name
+from ratelimit import make_session
+from page_archive import PageArchive, ARCHIVE_COLLECTION
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,6 +31,21 @@ class JobCrawlScheduler:
         self.crawl_time = "09:00"  # Crawl at 9:00 AM daily
         self.is_running = False
         
+        # Real crawl settings: categories come from crawl.urls and are crawled in parallel
+        # by a bounded thread pool, new jobs are saved to the shared jobs collection
+        self.crawl_workers = int(os.getenv('CRAWL_WORKERS', '4'))
+        self.max_pages = int(os.getenv('CRAWL_MAX_PAGES', '10'))
+        self.jobs_collection = 'jobs'
+        
+        # Persistent (category, page) task queue so an interrupted run resumes where it stopped
+        self.task_queue = CrawlTaskQueue(self.db[QUEUE_COLLECTION])
+        # Archive of fetched listing pages: conditional GETs, unchanged pages are not re-parsed
+        self.page_archive = PageArchive(self.db[ARCHIVE_COLLECTION])
+        self.poll_interval = 1.0
+        
+        # Callbacks run after each completed crawl (e.g. API figure cache warm-up)
+        self.post_crawl_hooks = []
+        
     def init_scheduler_status(self):
         """Initialize scheduler status in database"""
         try:
@@ -64,7 +87,7 @@ class JobCrawlScheduler:
             logger.error(f"Error checking crawl status: {e}")
             return False
     
-    def update_crawl_status(self, status: str, records: int = 0):
+    def update_crawl_status(self, status: str, records: int = 0, extra: Dict[str, Any] = None):
         """Update crawl status in database"""
         try:
             now = datetime.now()
@@ -82,6 +105,8 @@ class JobCrawlScheduler:
                 })
             elif status == "running":
                 update_data["crawled_today"] = False
+            if extra:
+                update_data.update(extra)
             
             self.scheduler_collection.update_one(
                 {"type": "daily_crawl"},
@@ -91,84 +116,178 @@ class JobCrawlScheduler:
         except Exception as e:
             logger.error(f"Error updating crawl status: {e}")
     
-    def crawl_today_jobs(self):
-        """Crawl jobs posted today from all categories"""
-        logger.info("Starting daily crawl job...")
-        self.update_crawl_status("running")
+    def crawl_today_jobs(self, run_id: str = None):
+        """Crawl new jobs from all categories through the persistent task queue.
         
-        total_crawled = 0
-        categories = ["python-developer", "java-developer", "react-developer", 
-                     "nodejs-developer", "php-developer", "dotnet-developer",
-                     "android-developer", "ios-developer", "devops-engineer"]
+        Every category starts with a page-1 task and a page with new jobs enqueues the next
+        page. Running the same run_id again (e.g. after a restart) only processes the tasks
+        that are not done yet.
+        """
+        run_id = run_id or f"daily-{datetime.now().strftime('%Y-%m-%d')}"
+        logger.info(f"Starting daily crawl job {run_id} ({len(crawl.urls)} categories, {self.crawl_workers} workers)...")
+        started_at = datetime.now()
+        self.update_crawl_status("running", extra={"run_id": run_id, "run_started_at": started_at, "categories": []})
         
         try:
-            for category in categories:
-                try:
-                    # Simulate crawling from page 1 only for today's jobs
-                    # In real implementation, you would call your actual crawl function
-                    crawled_count = self.crawl_category_today(category)
-                    total_crawled += crawled_count
-                    logger.info(f"Crawled {crawled_count} jobs from {category}")
-                    
-                    # Small delay between categories
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    logger.error(f"Error crawling {category}: {e}")
-                    continue
+            self.task_queue.enqueue(run_id, [(base_url, category, 1) for base_url, category in crawl.urls])
+            retried = self.task_queue.retry_failed(run_id)
+            if retried:
+                logger.info(f"Retrying {retried} failed tasks of {run_id}")
             
-            self.update_crawl_status("completed", total_crawled)
-            logger.info(f"Daily crawl completed. Total records: {total_crawled}")
+            # Load known keys once; all workers share the set to skip known pages
+            known_keys = crawl.load_known_keys(self.db.name, self.jobs_collection)
+            with ThreadPoolExecutor(max_workers=self.crawl_workers, thread_name_prefix='crawl') as pool:
+                # Relative dates ("2 ngày trước") are resolved against the run start, so a run
+                # that crosses midnight dates every page the same way
+                futures = [pool.submit(self.run_crawl_worker, run_id, known_keys, started_at)
+                           for _ in range(self.crawl_workers)]
+                for future in as_completed(futures):
+                    future.result()
+            
+            results = self.summarize_run(run_id)
+            total_crawled = sum(result["records"] for result in results)
+            failed = [result["category"] for result in results if result["failed_pages"]]
+            summary = {
+                "last_crawl_duration_s": round((datetime.now() - started_at).total_seconds(), 2),
+                "failed_categories": failed,
+                "categories": results
+            }
+            if results and all(result["status"] == "failed" for result in results):
+                logger.error("Daily crawl failed for every category")
+                self.update_crawl_status("error", extra=summary)
+                return
+            
+            self.update_crawl_status("completed", total_crawled, extra=summary)
+            logger.info(f"Daily crawl completed in {summary['last_crawl_duration_s']}s. "
+                        f"Total records: {total_crawled}, categories with failed pages: {len(failed)}")
+            self.refresh_snapshot()
+            self.run_post_crawl_hooks()
             
         except Exception as e:
             logger.error(f"Error in daily crawl: {e}")
             self.update_crawl_status("error")
     
-    def crawl_category_today(self, category: str) -> int:
-        """Crawl today's jobs for a specific category (page 1 only)"""
+    def run_crawl_worker(self, run_id: str, known_keys: set, fetched_at: datetime = None):
+        """Lease and process tasks until the run has no unfinished task left"""
+        owner = worker_name()
+        # requests.Session is not thread-safe, so each worker uses its own keep-alive pool;
+        # request pacing is shared across workers through ratelimit.rate_limiter
+        session = make_session()
         try:
-            # This would be replaced with your actual crawl logic
-            # For now, simulate crawling
-            
-            # Check if collection exists, if not create it
-            collection = self.db[category.replace('-', '_')]
-            
-            # Simulate getting today's jobs (in real implementation, filter by date)
+            while True:
+                task = self.task_queue.lease(run_id, owner)
+                if task is None:
+                    next_at = self.task_queue.next_available_at(run_id)
+                    if next_at is None:
+                        return
+                    # Tasks in backoff or leased by other workers (which may enqueue follow-up pages)
+                    wait = (next_at - datetime.now()).total_seconds()
+                    time.sleep(min(max(wait, 0.1), self.poll_interval))
+                    continue
+                self.process_crawl_task(task, session, known_keys, fetched_at)
+        finally:
+            session.close()
+    
+    def process_crawl_task(self, task: Dict[str, Any], session, known_keys: set, fetched_at: datetime = None):
+        """Crawl one (category, page) task, save new jobs and enqueue the next page if needed.
+
+        fetched_at is the reference time for relative post dates (the run start).
+        """
+        start = time.time()
+        try:
+            jobs_page = crawl.crawl_one_page(task["base_url"], task["page"], session, raise_errors=True,
+                                             archive=self.page_archive, category=task["category"],
+                                             fetched_at=fetched_at)
+            if jobs_page is None:
+                # Unchanged since a fetch whose jobs were already saved
+                self.task_queue.complete(task, {"fetched": 0, "new": 0, "records": 0, "unchanged": True,
+                                                "duration_s": round(time.time() - start, 2)})
+                return
+            # Keys are shared with the other workers only once the jobs are saved, so a failed
+            # save leaves them crawlable when the task is retried
+            jobs_new = crawl.filter_new_jobs(jobs_page, task["category"], known_keys, remember=False)
             today = datetime.now().strftime('%Y-%m-%d')
+            for job in jobs_new:
+                # Only stored on insert, used by /api/jobs/today
+                job["crawl_date"] = today
+                job["is_today"] = True
+            records = crawl.save_to_mongo(jobs_new, self.db.name, self.jobs_collection, raise_errors=True)
+            known_keys.update(crawl.make_unique_key(job) for job in jobs_new)
+            self.page_archive.record_jobs(task["base_url"], task["page"], len(jobs_page))
             
-            # Simulate crawled data (replace with actual crawl logic)
-            sample_jobs = [
-                {
-                    "title": f"Sample {category} Job {i}",
-                    "company": f"Company {i}",
-                    "location": "Hà Nội" if i % 2 == 0 else "TP.HCM",
-                    "salary_avg_million_vnd": 15 + (i * 2),
-                    "experience_years": f"{i} năm" if i > 0 else "Không yêu cầu",
-                    "skills": ["Python", "Django", "FastAPI"] if "python" in category else ["Java", "Spring"],
-                    "category": category.replace('-', '_'),
-                    "update_date": datetime.now(),
-                    "crawl_date": today,
-                    "is_today": True
-                }
-                for i in range(5)  # Simulate 5 jobs per category
-            ]
-            
-            # Insert only if not already exists today
-            existing_today = collection.count_documents({
-                "crawl_date": today,
-                "is_today": True
+            # A task leased again after its lease expired may find its jobs already saved,
+            # so it follows on whenever the page had jobs; the next page ends the chain
+            has_next = bool(jobs_new) or (bool(jobs_page) and task["attempts"] > 1)
+            if has_next and task["page"] < self.max_pages:
+                self.task_queue.enqueue(task["run_id"], [(task["base_url"], task["category"], task["page"] + 1)])
+            self.task_queue.complete(task, {
+                "fetched": len(jobs_page),
+                "new": len(jobs_new),
+                "records": records,
+                "duration_s": round(time.time() - start, 2)
             })
-            
-            if existing_today == 0:
-                collection.insert_many(sample_jobs)
-                return len(sample_jobs)
+        except Exception as e:
+            logger.warning(f"Task {task['_id']} failed (attempt {task['attempts']}): {e}")
+            self.task_queue.fail(task, e)
+    
+    def summarize_run(self, run_id: str):
+        """Per-category pages, counts, timing and failures of a run, built from its tasks"""
+        by_category = {}
+        for task in self.task_queue.tasks(run_id):
+            summary = by_category.setdefault(task["category"], {
+                "category": task["category"], "pages": 0, "failed_pages": 0,
+                "fetched": 0, "records": 0, "duration_s": 0.0, "error": None
+            })
+            if task["state"] == DONE:
+                result = task.get("result") or {}
+                summary["pages"] += 1
+                summary["fetched"] += result.get("fetched", 0)
+                summary["records"] += result.get("records", 0)
+                summary["duration_s"] = round(summary["duration_s"] + result.get("duration_s", 0), 2)
+            elif task["state"] == FAILED:
+                summary["failed_pages"] += 1
+                summary["error"] = task.get("error")
+        
+        for summary in by_category.values():
+            if summary["failed_pages"]:
+                summary["status"] = "partial" if summary["pages"] else "failed"
             else:
-                logger.info(f"Today's jobs already exist for {category}")
-                return 0
-                
+                summary["status"] = "completed" if summary["fetched"] else "empty"
+        return list(by_category.values())
+    
+    def resume_interrupted_crawl(self) -> bool:
+        """Resume a run left in "running" state by a previous process"""
+        try:
+            status = self.scheduler_collection.find_one({"type": "daily_crawl"})
+            if not status or status.get("crawl_status") != "running" or not status.get("run_id"):
+                return False
+            logger.info(f"Resuming interrupted crawl run {status['run_id']}: {self.task_queue.counts(status['run_id'])}")
+            threading.Thread(target=self.crawl_today_jobs, args=(status["run_id"],), daemon=True).start()
+            return True
         except Exception as e:
-            logger.error(f"Error crawling category {category}: {e}")
-            return 0
+            logger.error(f"Error resuming interrupted crawl: {e}")
+            return False
+    
+    def refresh_snapshot(self):
+        """Export the columnar snapshot used by the dashboards after a crawl"""
+        try:
+            rows = export_snapshot(self.db, version=get_dataset_version(self.db))
+            logger.info(f"Exported dashboard snapshot: {rows} rows")
+        except Exception as e:
+            logger.error(f"Error exporting snapshot: {e}")
+    
+    def add_post_crawl_hook(self, hook):
+        """Register a callable to run after each completed crawl"""
+        if hook not in self.post_crawl_hooks:
+            self.post_crawl_hooks.append(hook)
+    
+    def run_post_crawl_hooks(self):
+        """Run registered post-crawl hooks; a failing hook does not affect the others"""
+        for hook in self.post_crawl_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Error in post-crawl hook {getattr(hook, '__name__', hook)}: {e}")
     
     def get_next_crawl_time(self) -> Dict[str, Any]:
         """Get time until next crawl"""
@@ -228,6 +347,7 @@ class JobCrawlScheduler:
         
         # Initialize status
         self.init_scheduler_status()
+        self.resume_interrupted_crawl()
         
         # Schedule daily job
         schedule.every().day.at(self.crawl_time).do(self.job_function)
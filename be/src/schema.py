@@ -0,0 +1,164 @@
+"""Schema các trường job mà từng nơi dùng cần, và loader đọc MongoDB theo schema đó.
+
+Loader chỉ lấy các trường cần qua projection, đọc cursor theo batch và dựng DataFrame
+theo từng cột với kiểu cố định (lương float32, ngày datetime64, cột lặp nhiều là category)
+thay cho pd.DataFrame(list_of_dicts), nên ít dữ liệu truyền qua mạng và ít bộ nhớ hơn.
+"""
+from itertools import islice
+
+import pandas as pd
+
+# Kiểu của từng trường sau khi load
+FIELD_DTYPES = {
+    'title': 'object',
+    'company': 'category',
+    'category': 'category',
+    'location': 'category',
+    'experience_years': 'category',
+    'salary_text': 'object',
+    'salary_avg_million_vnd': 'float32',
+    'update_date': 'datetime64[ns]',
+    'skills': 'object',
+}
+
+# Các trường mà API, dashboard và snapshot dùng tới (theo thứ tự trong document crawl)
+JOB_FIELDS = ['title', 'company', 'salary_avg_million_vnd', 'location', 'experience_years',
+              'update_date', 'skills', 'category']
+
+CONSUMER_FIELDS = {
+    'api': JOB_FIELDS,
+    'dashboard': JOB_FIELDS,
+    'snapshot': JOB_FIELDS,
+    # nomalize_data.py giữ thêm salary_text trong file output
+    'normalize': ['title', 'company', 'salary_text', 'salary_avg_million_vnd', 'location',
+                  'experience_years', 'update_date', 'skills', 'category'],
+}
+
+# Collection không chứa job
+SYSTEM_COLLECTIONS = {'scheduler_status', 'crawl_tasks', 'page_archive'}
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def fields_for(consumer):
+    if consumer not in CONSUMER_FIELDS:
+        raise ValueError(f"Consumer không có trong schema: {consumer} (có: {', '.join(CONSUMER_FIELDS)})")
+    return CONSUMER_FIELDS[consumer]
+
+
+def projection(fields):
+    """Projection MongoDB chỉ lấy các trường cần, bỏ _id"""
+    spec = {field: 1 for field in fields}
+    spec['_id'] = 0
+    return spec
+
+
+def typed_column(field, values, categorical=True):
+    """List giá trị thô -> Series đúng kiểu trong FIELD_DTYPES"""
+    dtype = FIELD_DTYPES.get(field, 'object')
+    if dtype == 'float32':
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype('float32')
+    if dtype.startswith('datetime64'):
+        return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce')
+    if dtype == 'category' and categorical:
+        return pd.Series(values, dtype=object).astype('category')
+    return pd.Series(values, dtype=object)
+
+
+class ColumnBuilder:
+    """Gom document thành list theo từng cột, chỉ giữ những trường thực sự có trong dữ liệu"""
+
+    def __init__(self, fields, extra_columns=()):
+        self.fields = list(fields)
+        self.columns = {field: [] for field in self.fields}
+        for name in extra_columns:
+            self.columns[name] = []
+        self.seen = set()
+        self.rows = 0
+
+    def add_documents(self, cursor, defaults=None, extra=None):
+        columns = self.columns
+        fields = self.fields
+        defaults = defaults or {}
+        extra = extra or {}
+        seen = self.seen
+        rows_before = self.rows
+        for doc in cursor:
+            for field in fields:
+                value = doc.get(field)
+                if value is None:
+                    value = defaults.get(field)
+                else:
+                    seen.add(field)
+                columns[field].append(value)
+            for name, value in extra.items():
+                columns[name].append(value)
+            self.rows += 1
+        if self.rows > rows_before:
+            seen.update(field for field in defaults if field in columns)
+
+    def to_frame(self, categorical=True, all_fields=False):
+        """all_fields=True giữ cả trường không có trong dữ liệu (cột rỗng đúng kiểu),
+        để các chunk đọc liên tiếp có cùng schema"""
+        if not self.rows:
+            return pd.DataFrame()
+        data = {}
+        for name, values in self.columns.items():
+            if not all_fields and name in self.fields and name not in self.seen:
+                continue
+            data[name] = typed_column(name, values, categorical)
+        return pd.DataFrame(data)
+
+
+def find_fields(collection, fields, query=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Cursor chỉ lấy các trường cần, đọc theo batch"""
+    return collection.find(query or {}, projection(fields), batch_size=batch_size)
+
+
+def load_jobs(db, consumer, collection_name=None, categorical=True, source_column=None,
+              batch_size=DEFAULT_BATCH_SIZE):
+    """Load job của một collection hoặc mọi collection (category mặc định là tên collection).
+
+    source_column: nếu có, thêm cột chứa tên collection gốc của từng dòng.
+    """
+    fields = fields_for(consumer)
+    builder = ColumnBuilder(fields, [source_column] if source_column else ())
+
+    if collection_name:
+        extra = {source_column: collection_name} if source_column else None
+        builder.add_documents(find_fields(db[collection_name], fields, batch_size=batch_size), extra=extra)
+    else:
+        for coll_name in db.list_collection_names():
+            if coll_name in SYSTEM_COLLECTIONS:
+                continue
+            extra = {source_column: coll_name} if source_column else None
+            builder.add_documents(find_fields(db[coll_name], fields, batch_size=batch_size),
+                                  defaults={'category': coll_name}, extra=extra)
+
+    return builder.to_frame(categorical)
+
+
+def iter_job_batches(collection, consumer, query=None, chunk_size=DEFAULT_BATCH_SIZE, categorical=False):
+    """Đọc collection theo thứ tự _id, mỗi chunk chunk_size document.
+
+    Yield (DataFrame đủ các cột của consumer, _id của document cuối chunk); _id cuối dùng
+    làm watermark để lần sau chỉ đọc các document mới hơn.
+    """
+    fields = fields_for(consumer)
+    spec = projection(fields)
+    spec['_id'] = 1
+    cursor = collection.find(query or {}, spec, batch_size=chunk_size).sort('_id', 1)
+    while True:
+        batch = list(islice(cursor, chunk_size))
+        if not batch:
+            break
+        builder = ColumnBuilder(fields)
+        builder.add_documents(batch)
+        yield builder.to_frame(categorical, all_fields=True), batch[-1]['_id']
+
+
+def iter_job_frames(collection, consumer, query=None, chunk_size=DEFAULT_BATCH_SIZE, categorical=False):
+    """Đọc collection theo từng chunk chunk_size document, mỗi chunk là một DataFrame
+    đủ các cột của consumer, nên bộ nhớ không phụ thuộc kích thước collection"""
+    for frame, _ in iter_job_batches(collection, consumer, query, chunk_size, categorical):
+        yield frame
@@ -0,0 +1,150 @@
+"""Snapshot dạng cột (Arrow IPC) của toàn bộ dữ liệu job cho dashboard.
+
+Sau mỗi lần crawl, export_snapshot() ghi dữ liệu đã làm sạch ra một file Arrow,
+các cột lặp nhiều (category, company, location) được dictionary-encode.
+Dashboard gọi load_snapshot() để memory-map file thay vì quét toàn bộ MongoDB.
+"""
+import os
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from cache import get_dataset_version
+from schema import load_jobs
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+SNAPSHOT_PATH = os.getenv(
+    'JOBS_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'jobs_snapshot.arrow')
+)
+
+# Chỉ gồm trường thô của job (city được dashboard tính sau từ location)
+CATEGORICAL_COLUMNS = ['category', 'company', 'location']
+
+# Cột lưu tên collection gốc để lọc theo collection khi load
+COLLECTION_COLUMN = '_collection'
+
+
+def read_collections(db):
+    """Đọc mọi collection thành một DataFrame theo schema 'snapshot' (category mặc định là tên collection)"""
+    return load_jobs(db, 'snapshot', source_column=COLLECTION_COLUMN)
+
+
+def clean_for_snapshot(df):
+    """Chuẩn hóa kiểu dữ liệu trước khi ghi ra Arrow"""
+    if 'salary_avg_million_vnd' in df.columns:
+        df['salary_avg_million_vnd'] = pd.to_numeric(df['salary_avg_million_vnd'], errors='coerce').fillna(0)
+    if 'update_date' in df.columns:
+        df['update_date'] = pd.to_datetime(df['update_date'], errors='coerce')
+    for col in CATEGORICAL_COLUMNS + [COLLECTION_COLUMN]:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def to_arrow_table(df):
+    """Chuyển DataFrame sang Arrow; cột object có kiểu lẫn lộn được ép về string"""
+    arrays = []
+    names = []
+    for col in df.columns:
+        try:
+            array = pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = pa.array(df[col].map(lambda x: None if x is None or x is pd.NaT else str(x)),
+                             type=pa.string(), from_pandas=True)
+        arrays.append(array)
+        names.append(str(col))
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def export_snapshot(db, path=SNAPSHOT_PATH, version=None):
+    """Ghi snapshot của toàn bộ database ra file Arrow IPC, trả về số dòng đã ghi.
+
+    version (mặc định get_dataset_version(db), lấy trước khi đọc dữ liệu) được lưu trong
+    metadata để dashboard biết snapshot còn khớp với MongoDB hay không (snapshot_matches).
+    """
+    if not HAS_PYARROW:
+        print("pyarrow chưa được cài, bỏ qua export snapshot")
+        return 0
+    if version is None:
+        version = get_dataset_version(db)
+
+    df = read_collections(db)
+    if df.empty:
+        return 0
+    df = clean_for_snapshot(df)
+
+    table = to_arrow_table(df)
+    metadata = {
+        'exported_at': datetime.now().isoformat(),
+        'rows': str(len(df)),
+        'version': json.dumps(version, default=str)
+    }
+    table = table.replace_schema_metadata({k: v.encode() for k, v in metadata.items()})
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    # Không nén để file memory-map được trực tiếp
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # Ghi file tạm rồi rename để dashboard không đọc phải file đang ghi dở
+    os.replace(tmp_path, path)
+    print(f"Exported snapshot: {len(df)} rows -> {path}")
+    return len(df)
+
+
+def snapshot_info(path=SNAPSHOT_PATH):
+    """Metadata của snapshot (None nếu chưa có file)"""
+    if not HAS_PYARROW or not os.path.exists(path):
+        return None
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    info = {k.decode(): v.decode() for k, v in metadata.items()}
+    info['mtime'] = os.path.getmtime(path)
+    return info
+
+
+def snapshot_matches(info, version):
+    """Snapshot (metadata từ snapshot_info) được export từ đúng dataset version này"""
+    return info is not None and info.get('version') == json.dumps(version, default=str)
+
+
+def load_snapshot(collection_name=None, path=SNAPSHOT_PATH, columns=None, categorical=True):
+    """Memory-map snapshot thành DataFrame; trả về None nếu chưa có snapshot.
+
+    categorical=False giải mã các cột dictionary về object như khi load từ MongoDB.
+    """
+    if not HAS_PYARROW or not os.path.exists(path):
+        return None
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    if collection_name and collection_name != "Tất cả":
+        mask = pc.equal(table[COLLECTION_COLUMN].cast(pa.string()), collection_name)
+        table = table.filter(mask)
+    if columns:
+        table = table.select([c for c in columns if c in table.column_names])
+    if COLLECTION_COLUMN in table.column_names:
+        table = table.drop([COLLECTION_COLUMN])
+
+    if not categorical:
+        table = pa.Table.from_arrays(
+            [col.cast(col.type.value_type) if pa.types.is_dictionary(col.type) else col
+             for col in table.columns],
+            names=table.column_names
+        )
+    df = table.to_pandas()
+    # to_pandas trả cột list (vd skills) dạng numpy.ndarray; đổi về list như khi load từ MongoDB
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+            df[name] = pd.Series(column.to_pylist(), index=df.index, dtype=object)
+    return df
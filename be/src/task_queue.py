@@ -0,0 +1,169 @@
+"""Hàng đợi task crawl lưu trong MongoDB (collection crawl_tasks).
+
+Mỗi task là một (category, page) của một lần chạy (run_id), có trạng thái
+pending -> leased -> done / failed, số lần thử và thời điểm được chạy lại (backoff).
+Worker lease task bằng find_one_and_update nên nhiều worker (kể cả ở process khác) không
+lấy trùng task; lease có hạn, worker chết giữa chừng thì task tự được lease lại khi hết hạn.
+Enqueue là upsert theo _id nên chạy lại cùng run_id chỉ làm tiếp các task chưa xong.
+"""
+import os
+import uuid
+import random
+import socket
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument, UpdateOne
+
+QUEUE_COLLECTION = 'crawl_tasks'
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_LEASE_SECONDS = int(os.getenv('CRAWL_TASK_LEASE_SECONDS', '300'))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('CRAWL_TASK_MAX_ATTEMPTS', '4'))
+# Backoff giữa các lần thử: base * 2^(attempt-1) giây, tối đa BACKOFF_MAX
+DEFAULT_BACKOFF_BASE = float(os.getenv('CRAWL_TASK_BACKOFF', '30'))
+DEFAULT_BACKOFF_MAX = 3600
+
+
+def task_id(run_id, category, page):
+    return f"{run_id}:{category}:{page}"
+
+
+def worker_name():
+    """Tên worker duy nhất (host, pid, thread) để ghi vào lease"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class CrawlTaskQueue:
+    """Hàng đợi task (category, page) có lease, retry và backoff"""
+
+    def __init__(self, collection, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._indexed = False
+
+    def ensure_indexes(self):
+        if self._indexed:
+            return
+        self.collection.create_index([('run_id', 1), ('state', 1), ('available_at', 1)])
+        self.collection.create_index([('run_id', 1), ('state', 1), ('lease_expires_at', 1)])
+        self._indexed = True
+
+    def enqueue(self, run_id, tasks):
+        """Thêm các task (base_url, category, page); task đã có (kể cả đã xong) được giữ nguyên"""
+        self.ensure_indexes()
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {'_id': task_id(run_id, category, page)},
+                {'$setOnInsert': {
+                    'run_id': run_id,
+                    'base_url': base_url,
+                    'category': category,
+                    'page': page,
+                    'state': PENDING,
+                    'attempts': 0,
+                    'available_at': now,
+                    'created_at': now,
+                    'updated_at': now
+                }},
+                upsert=True
+            )
+            for base_url, category, page in tasks
+        ]
+        if not operations:
+            return 0
+        return self.collection.bulk_write(operations, ordered=False).upserted_count
+
+    def lease(self, run_id, owner):
+        """Lấy một task sẵn sàng chạy (pending đã hết backoff, hoặc leased đã hết hạn lease)"""
+        now = datetime.now()
+        return self.collection.find_one_and_update(
+            {'run_id': run_id, '$or': [
+                {'state': PENDING, 'available_at': {'$lte': now}},
+                {'state': LEASED, 'lease_expires_at': {'$lte': now}},
+            ]},
+            {'$set': {
+                'state': LEASED,
+                'lease_owner': owner,
+                'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+                'updated_at': now
+            }, '$inc': {'attempts': 1}},
+            sort=[('available_at', 1), ('page', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def complete(self, task, result=None):
+        """Đánh dấu task xong; bỏ qua nếu lease đã chuyển sang worker khác"""
+        updated = self.collection.update_one(
+            {'_id': task['_id'], 'state': LEASED, 'lease_owner': task['lease_owner']},
+            {'$set': {'state': DONE, 'result': result or {}, 'error': None, 'updated_at': datetime.now()},
+             '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+        )
+        return updated.modified_count == 1
+
+    def fail(self, task, error):
+        """Trả task về pending kèm backoff, hoặc failed nếu đã hết số lần thử"""
+        now = datetime.now()
+        attempts = task.get('attempts', 1)
+        update = {'error': str(error), 'updated_at': now}
+        if attempts >= self.max_attempts:
+            update['state'] = FAILED
+        else:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+            update['state'] = PENDING
+            update['available_at'] = now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        updated = self.collection.update_one(
+            {'_id': task['_id'], 'state': LEASED, 'lease_owner': task['lease_owner']},
+            {'$set': update, '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+        )
+        return updated.modified_count == 1
+
+    def skip_after(self, run_id, category, page):
+        """Bỏ các task pending của category có page > page (vd category đã hết trang)"""
+        now = datetime.now()
+        return self.collection.update_many(
+            {'run_id': run_id, 'category': category, 'page': {'$gt': page}, 'state': PENDING},
+            {'$set': {'state': DONE, 'result': {'skipped': True}, 'updated_at': now}}
+        ).modified_count
+
+    def retry_failed(self, run_id):
+        """Cho các task failed của run một lượt thử mới (vd khi chạy lại thủ công)"""
+        now = datetime.now()
+        return self.collection.update_many(
+            {'run_id': run_id, 'state': FAILED},
+            {'$set': {'state': PENDING, 'attempts': 0, 'available_at': now, 'updated_at': now}}
+        ).modified_count
+
+    def next_available_at(self, run_id):
+        """Thời điểm sớm nhất có task chưa xong có thể lease được, None nếu run đã xong"""
+        times = []
+        pending = self.collection.find_one({'run_id': run_id, 'state': PENDING},
+                                           {'available_at': 1}, sort=[('available_at', 1)])
+        if pending:
+            times.append(pending['available_at'])
+        leased = self.collection.find_one({'run_id': run_id, 'state': LEASED},
+                                          {'lease_expires_at': 1}, sort=[('lease_expires_at', 1)])
+        if leased:
+            times.append(leased['lease_expires_at'])
+        return min(times) if times else None
+
+    def counts(self, run_id):
+        """Số task theo trạng thái"""
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for doc in self.collection.aggregate([
+            {'$match': {'run_id': run_id}},
+            {'$group': {'_id': '$state', 'count': {'$sum': 1}}}
+        ]):
+            counts[doc['_id']] = doc['count']
+        return counts
+
+    def tasks(self, run_id):
+        return list(self.collection.find({'run_id': run_id}).sort([('category', 1), ('page', 1)]))
@@ -0,0 +1,135 @@
+"""Chạy code blocking (pymongo, pandas, Plotly) ngoài event loop của API.
+
+Các handler async gọi run_blocking(endpoint, func, ...): func chạy trong thread pool có
+giới hạn, và mỗi endpoint có semaphore riêng để một loại request nặng (vd chart) không
+chiếm hết pool của các endpoint khác. Event loop chỉ await nên /health luôn phản hồi ngay.
+
+Phần dựng figure nặng CPU được đẩy tiếp sang process pool qua run_in_process() để chạy
+song song trên nhiều core thay vì tranh GIL trong cùng một interpreter.
+"""
+import os
+import asyncio
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Số thread chạy code blocking (gồm cả build chart và query MongoDB)
+BLOCKING_THREADS = int(os.getenv('API_BLOCKING_THREADS', '8'))
+
+# Số request đồng thời tối đa cho mỗi endpoint, endpoint không có trong dict dùng DEFAULT_LIMIT
+DEFAULT_LIMIT = int(os.getenv('API_ENDPOINT_LIMIT', '4'))
+ENDPOINT_LIMITS = {
+    'collections': 8,
+    'summary': 4,
+    'crawler': 4,
+}
+
+# Số process dựng chart nặng CPU, 0 = dựng ngay trong thread gọi
+CHART_PROCESSES = int(os.getenv('API_CHART_PROCESSES', str(os.cpu_count() or 1)))
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_THREADS, thread_name_prefix='api-blocking')
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+class EndpointLimiter:
+    """Semaphore theo endpoint, kèm số request đang chạy / đang chờ để theo dõi"""
+
+    def __init__(self, limits=None, default_limit=DEFAULT_LIMIT):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self.running = {}
+        self.waiting = {}
+
+    def limit_for(self, endpoint):
+        return self.limits.get(endpoint, self.default_limit)
+
+    def _semaphore(self, endpoint):
+        with self._lock:
+            if endpoint not in self._semaphores:
+                self._semaphores[endpoint] = asyncio.Semaphore(self.limit_for(endpoint))
+            return self._semaphores[endpoint]
+
+    async def run(self, endpoint, executor, func, *args, **kwargs):
+        semaphore = self._semaphore(endpoint)
+        self.waiting[endpoint] = self.waiting.get(endpoint, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[endpoint] -= 1
+        self.running[endpoint] = self.running.get(endpoint, 0) + 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.running[endpoint] -= 1
+            semaphore.release()
+
+    def stats(self):
+        return {
+            endpoint: {
+                "limit": self.limit_for(endpoint),
+                "running": self.running.get(endpoint, 0),
+                "waiting": self.waiting.get(endpoint, 0)
+            }
+            for endpoint in self._semaphores
+        }
+
+
+endpoint_limiter = EndpointLimiter(ENDPOINT_LIMITS)
+
+
+async def run_blocking(endpoint, func, *args, **kwargs):
+    """Chạy func(*args, **kwargs) trong thread pool, giới hạn theo endpoint"""
+    return await endpoint_limiter.run(endpoint, blocking_executor, func, *args, **kwargs)
+
+
+def get_process_pool():
+    """Process pool tạo lazy; dùng spawn vì fork một process đang có thread (uvicorn, scheduler,
+    pymongo monitor) có thể deadlock"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None and CHART_PROCESSES > 0:
+            _process_pool = ProcessPoolExecutor(max_workers=CHART_PROCESSES,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+def run_in_process(func, *args):
+    """Chạy func(*args) trong process pool và chờ kết quả (gọi từ thread của blocking_executor).
+
+    func và args phải pickle được; nếu pool không dùng được thì chạy ngay trong thread hiện tại.
+    """
+    global _process_pool
+    pool = get_process_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool as e:
+        print(f"Chart process pool bị hỏng, tạo lại và chạy trong thread: {e}")
+        with _process_pool_lock:
+            if _process_pool is pool:
+                _process_pool = None
+        return func(*args)
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def executor_stats():
+    return {
+        "blocking_threads": BLOCKING_THREADS,
+        "chart_processes": CHART_PROCESSES,
+        "endpoints": endpoint_limiter.stats()
+    }